@@ -0,0 +1,50 @@
+# aws/_clients.py
+
+import logging
+import functools
+import boto3
+from botocore.config import Config
+from aws.aws_config import AWS_REGION
+
+# One session for the whole process; clients below share its credentials
+SESSION = boto3.session.Session(region_name=AWS_REGION)
+
+# Adaptive retries back off on throttling, and short connect timeouts keep a
+# bad credentials/IMDS path from hanging a cycle for minutes.
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 10},
+    connect_timeout=3,
+    read_timeout=10,
+    max_pool_connections=20,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def ec2_client():
+    """Shared EC2 client (created on first use)."""
+    return SESSION.client("ec2", config=CLIENT_CONFIG)
+
+
+@functools.lru_cache(maxsize=None)
+def ssm_client():
+    """Shared SSM client (created on first use)."""
+    return SESSION.client("ssm", config=CLIENT_CONFIG)
+
+
+def prewarm_credentials() -> bool:
+    """
+    Resolve AWS credentials once at startup via sts:GetCallerIdentity.
+
+    Surfaces missing/invalid credentials in the log at boot instead of on the
+    first autoscale cycle. Never raises.
+
+    Returns:
+        True if credentials resolved, False otherwise
+    """
+    try:
+        identity = SESSION.client("sts", config=CLIENT_CONFIG).get_caller_identity()
+        logging.info(f"AWS credentials resolved for {identity.get('Arn')}")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to resolve AWS credentials at startup: {e}")
+        return False
@@ -1,25 +1,45 @@
 # aws/ec2_controller.py
 
-import boto3
 import time
 import logging
-from aws.aws_config import AWS_REGION, INSTANCE_ID, INSTANCE_SEQUENCE
-from backend.config import DRY_RUN
-from aws.monitoring_setup import setup_monitoring_on_instance
+from concurrent.futures import ThreadPoolExecutor
+from aws.aws_config import INSTANCE_ID, INSTANCE_SEQUENCE
+from aws._clients import ec2_client
+from backend.config import DRY_RUN, WAITER_DELAY_SECONDS, WAITER_MAX_ATTEMPTS
+from aws.monitoring_setup import (
+    setup_monitoring_on_instance,
+    get_instance_info,
+    invalidate_instance_cache,
+)
 
-ec2 = boto3.client("ec2", region_name=AWS_REGION)
+ec2 = ec2_client()
+
+WAITER_CONFIG = {"Delay": WAITER_DELAY_SECONDS, "MaxAttempts": WAITER_MAX_ATTEMPTS}
+
+# Monitoring (re)configuration runs here so it never holds up a scaling call
+_monitoring_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="monitoring-setup")
 
 
 def get_instance_type():
     """Get current EC2 instance type and state."""
     try:
-        res = ec2.describe_instances(InstanceIds=[INSTANCE_ID])
-        instance = res["Reservations"][0]["Instances"][0]
-        return instance["InstanceType"], instance["State"]["Name"]
+        info = get_instance_info(INSTANCE_ID)
+        return info["instance_type"], info["state"]
     except Exception as e:
         logging.error(f"Failed to get instance type: {e}")
         raise
 
+def _wait_for_state(waiter_name):
+    """Block on an EC2 waiter with tuned polling, then drop stale cached state."""
+    waiter = ec2.get_waiter(waiter_name)
+    waiter.wait(InstanceIds=[INSTANCE_ID], WaiterConfig=WAITER_CONFIG)
+    invalidate_instance_cache(INSTANCE_ID)
+
+def _log_monitoring_failure(future):
+    err = future.exception()
+    if err is not None:
+        logging.error(f"Monitoring setup failed after scaling: {err}")
+
 def change_instance_type(new_type):
     """
     Change EC2 instance type (STOP → MODIFY → START).
@@ -66,13 +86,14 @@ def change_instance_type(new_type):
             InstanceId=INSTANCE_ID,
             InstanceType={"Value": new_type},
         )
+        invalidate_instance_cache(INSTANCE_ID)
 
         logging.info(f"✅ Instance type modified to {new_type}")
 
         # Start instance
         ec2.start_instances(InstanceIds=[INSTANCE_ID])
-        waiter = ec2.get_waiter("instance_running")
-        waiter.wait(InstanceIds=[INSTANCE_ID])
+        # New boot means new public IP, so the cache is dropped once running
+        _wait_for_state("instance_running")
 
         logging.info(f"✅ Instance started with new type {new_type}")
 
@@ -83,13 +104,11 @@ def change_instance_type(new_type):
             "new_type": new_type,
         }
 
-        # After a successful, non-dry-run change, ensure monitoring is set up
-        try:
-            setup_monitoring_on_instance(INSTANCE_ID)
-        except Exception as monitor_err:
-            logging.error(
-                f"Monitoring setup failed after scaling to {new_type}: {monitor_err}"
-            )
+        # After a successful, non-dry-run change, ensure monitoring is set up.
+        # The SSM send needs a running instance, so it is only dispatched once
+        # the waiter returns, but the caller does not wait for it.
+        future = _monitoring_executor.submit(setup_monitoring_on_instance, INSTANCE_ID)
+        future.add_done_callback(_log_monitoring_failure)
 
         return result
     except Exception as e:
@@ -134,8 +153,7 @@ def scale_up():
         if current_state == "running":
             logging.info(f"Stopping instance {INSTANCE_ID} before scaling up...")
             ec2.stop_instances(InstanceIds=[INSTANCE_ID])
-            waiter = ec2.get_waiter("instance_stopped")
-            waiter.wait(InstanceIds=[INSTANCE_ID])
+            _wait_for_state("instance_stopped")
             logging.info("Instance stopped")
 
         return change_instance_type(new_type)
@@ -181,8 +199,7 @@ def scale_down():
         if current_state == "running":
             logging.info(f"Stopping instance {INSTANCE_ID} before scaling down...")
             ec2.stop_instances(InstanceIds=[INSTANCE_ID])
-            waiter = ec2.get_waiter("instance_stopped")
-            waiter.wait(InstanceIds=[INSTANCE_ID])
+            _wait_for_state("instance_stopped")
             logging.info("Instance stopped")
 
         return change_instance_type(new_type)
@@ -1,12 +1,83 @@
+import time
 import logging
-import boto3
 
-from aws.aws_config import AWS_REGION, INSTANCE_ID
-from backend.config import DRY_RUN
+from aws.aws_config import INSTANCE_ID
+from aws._clients import ec2_client, ssm_client
+from backend.config import DRY_RUN, INSTANCE_CACHE_TTL_SECONDS
 
 
-ec2 = boto3.client("ec2", region_name=AWS_REGION)
-ssm = boto3.client("ssm", region_name=AWS_REGION)
+ec2 = ec2_client()
+ssm = ssm_client()
+
+# Terminated / shutting-down instances are never autoscaling targets
+ACTIVE_INSTANCE_STATES = ["pending", "running", "stopping", "stopped"]
+
+# Cached describe_instances results, keyed by instance ID
+_instance_cache = {}
+
+
+def describe_instances_paginated(instance_ids=None, filters=None) -> list:
+    """
+    Describe instances across all result pages and flatten the reservations.
+
+    Args:
+        instance_ids: Optional list of instance IDs to restrict the query to
+        filters: EC2 filters; defaults to instances in ACTIVE_INSTANCE_STATES
+
+    Returns:
+        list of instance dicts (Reservations[*].Instances[*])
+    """
+    if filters is None:
+        filters = [{"Name": "instance-state-name", "Values": ACTIVE_INSTANCE_STATES}]
+
+    kwargs = {"Filters": filters}
+    if instance_ids:
+        kwargs["InstanceIds"] = list(instance_ids)
+    else:
+        # EC2 rejects MaxResults together with InstanceIds
+        kwargs["PaginationConfig"] = {"PageSize": 100}
+
+    instances = []
+    for page in ec2.get_paginator("describe_instances").paginate(**kwargs):
+        for reservation in page["Reservations"]:
+            instances.extend(reservation["Instances"])
+    return instances
+
+
+def get_instance_info(instance_id: str | None = None, ttl: float = INSTANCE_CACHE_TTL_SECONDS) -> dict:
+    """
+    Return type, state and IPs of an instance from a single describe_instances call.
+
+    Results are reused for `ttl` seconds so one autoscale cycle only pays for
+    one EC2 API round-trip. Call invalidate_instance_cache() after any
+    stop/start/modify so the next lookup sees the new state.
+    """
+    target_id = instance_id or INSTANCE_ID
+    cached = _instance_cache.get(target_id)
+    if cached and time.monotonic() - cached["fetched_at"] < ttl:
+        return cached
+
+    instances = describe_instances_paginated([target_id])
+    if not instances:
+        raise ValueError(f"Instance {target_id} not found or not in an active state")
+    instance = instances[0]
+    info = {
+        "instance_type": instance["InstanceType"],
+        "state": instance["State"]["Name"],
+        "public_ip": instance.get("PublicIpAddress"),
+        "private_ip": instance.get("PrivateIpAddress"),
+        "fetched_at": time.monotonic(),
+    }
+    _instance_cache[target_id] = info
+    return info
+
+
+def invalidate_instance_cache(instance_id: str | None = None) -> None:
+    """Drop cached instance details (all instances if no ID is given)."""
+    if instance_id is None:
+        _instance_cache.clear()
+    else:
+        _instance_cache.pop(instance_id, None)
 
 
 def get_instance_ip(instance_id: str | None = None, use_public: bool = True) -> str:
@@ -18,18 +89,17 @@ def get_instance_ip(instance_id: str | None = None, use_public: bool = True) ->
     """
     target_id = instance_id or INSTANCE_ID
     try:
-        res = ec2.describe_instances(InstanceIds=[target_id])
-        instance = res["Reservations"][0]["Instances"][0]
+        info = get_instance_info(target_id)
 
         if use_public:
-            ip_key = "PublicIpAddress"
+            ip_key = "public_ip"
         else:
-            ip_key = "PrivateIpAddress"
+            ip_key = "private_ip"
 
-        ip = instance.get(ip_key)
+        ip = info.get(ip_key)
         if not ip:
             # Fall back to private IP if public isn't available
-            ip = instance.get("PrivateIpAddress")
+            ip = info.get("private_ip")
 
         if not ip:
             raise ValueError(f"No IP address found for instance {target_id}")
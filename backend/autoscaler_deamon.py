@@ -1,19 +1,22 @@
-import os
 import sys
 import time
 import signal
 import logging
-import requests
-from backend.config import FETCH_INTERVAL_SECONDS, LOG_FILE, DRY_RUN
-
-# Setup logging
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
+import traceback
+from backend.config import (
+    FETCH_INTERVAL_SECONDS,
+    LOG_FILE,
+    DRY_RUN,
+    RETRY_BACKOFF_INITIAL_SECONDS,
+    RETRY_BACKOFF_MAX_SECONDS,
 )
+from backend.logging_setup import setup_logging
+from backend.core import run_autoscale_cycle
+from aws._clients import prewarm_credentials
+from ml.load_models import warmup
+
+# Setup logging (queued; file writes happen on a background thread)
+setup_logging()
 
 # Global flag for graceful shutdown
 shutdown_requested = False
@@ -24,20 +27,28 @@ def signal_handler(sig, frame):
     logging.info("Shutdown signal received, finishing current cycle...")
     shutdown_requested = True
 
-def call_autoscale_endpoint():
-    """Call the /autoscale endpoint."""
+def _fmt(value, spec, suffix=""):
+    """Format a number for the console summary, or 'N/A' if there is none."""
+    return "N/A" if value is None else format(value, spec) + suffix
+
+def run_cycle():
+    """
+    Run one autoscaling cycle in-process (no HTTP round-trip to the API).
+
+    A cycle skipped by the cooldown still counts as successful; its result
+    may have no prediction yet (cooldown set by another process or before a
+    restart), so predicted_cpu/confidence can be None.
+    """
     try:
-        # Try to call local FastAPI endpoint
-        response = requests.get("http://localhost:8000/autoscale", timeout=60)
-        response.raise_for_status()
-        result = response.json()
+        result = run_autoscale_cycle()
         
         # Print result to console for visibility
         print(f"\n{'='*60}")
         print(f"Cycle completed at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Predicted CPU: {result.get('predicted_cpu', 'N/A'):.2f}%")
-        print(f"Confidence: {result.get('confidence', 'N/A'):.3f}")
+        print(f"Predicted CPU: {_fmt(result.get('predicted_cpu'), '.2f', '%')}")
+        print(f"Confidence: {_fmt(result.get('confidence'), '.3f')}")
         print(f"Decision: {result.get('decision', 'N/A')}")
+        print(f"Reason: {result.get('reason', 'N/A')}")
         print(f"Action Taken: {result.get('action_taken', 'N/A')}")
         print(f"Current Instance: {result.get('current_instance_type', 'N/A')}")
         if DRY_RUN:
@@ -45,13 +56,9 @@ def call_autoscale_endpoint():
         print(f"{'='*60}\n")
         
         return result
-    except requests.exceptions.ConnectionError:
-        logging.error("Cannot connect to FastAPI server. Is it running?")
-        print("ERROR: Cannot connect to FastAPI server at http://localhost:8000")
-        print("Please start the server first: uvicorn backend.main:app --host 0.0.0.0 --port 8000")
-        return None
     except Exception as e:
-        logging.error(f"Failed to call autoscale endpoint: {e}")
+        logging.error(f"Autoscaling cycle failed: {e}")
+        print(f"ERROR: Autoscaling cycle failed: {e}")
         return None
 
 def autoscale_loop():
@@ -74,20 +81,34 @@ def autoscale_loop():
     print(f"   Log file: {LOG_FILE}")
     print(f"\nPress Ctrl+C to stop\n")
     
+    prewarm_credentials()
+    warmup()
+    
     cycle_count = 0
+    consecutive_failures = 0
     
     while not shutdown_requested:
+        # Deadline is fixed at cycle start so the cadence doesn't drift by
+        # however long the cycle itself takes.
+        next_tick = time.monotonic() + FETCH_INTERVAL_SECONDS
         try:
             cycle_count += 1
             logging.info(f"Starting autoscaling cycle #{cycle_count}")
             
-            result = call_autoscale_endpoint()
+            result = run_cycle()
             
             if result is None:
-                logging.warning("Autoscale endpoint call failed, waiting before retry...")
-                time.sleep(30)  # Wait 30s before retry if endpoint unavailable
+                # Exponential backoff: 1s, 2s, 4s, ... capped
+                consecutive_failures += 1
+                backoff = min(
+                    RETRY_BACKOFF_INITIAL_SECONDS * 2 ** (consecutive_failures - 1),
+                    RETRY_BACKOFF_MAX_SECONDS,
+                )
+                logging.warning(f"Autoscaling cycle failed, retrying in {backoff}s...")
+                time.sleep(backoff)
                 continue
             
+            consecutive_failures = 0
             logging.info(f"Cycle #{cycle_count} completed successfully")
             
         except KeyboardInterrupt:
@@ -99,14 +120,14 @@ def autoscale_loop():
         
         # Sleep until next cycle (unless shutdown requested)
         if not shutdown_requested:
-            logging.info(f"Sleeping for {FETCH_INTERVAL_SECONDS} seconds...")
-            time.sleep(FETCH_INTERVAL_SECONDS)
+            remaining = max(0.0, next_tick - time.monotonic())
+            logging.info(f"Sleeping for {remaining:.1f} seconds...")
+            time.sleep(remaining)
     
     logging.info("Autoscaler daemon stopped")
     print("\n✅ Autoscaler daemon stopped gracefully")
 
 if __name__ == "__main__":
-    import traceback
     try:
         autoscale_loop()
     except Exception as e:
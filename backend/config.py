@@ -4,8 +4,13 @@ import os
 
 FETCH_INTERVAL_SECONDS = 300  # 5 minutes
 WINDOW_SECONDS = 300          # 5 minutes history
+STEP_SECONDS = 5              # Prometheus sample resolution
 PREDICTION_HORIZON = 60       # predict +60s
 
+# Daemon retry backoff after a failed cycle (doubles each time, capped)
+RETRY_BACKOFF_INITIAL_SECONDS = 1
+RETRY_BACKOFF_MAX_SECONDS = 60
+
 # Scaling thresholds (as per spec)
 SCALE_UP_CPU = 50.0           # Scale up if predicted CPU > 75%
 SCALE_DOWN_CPU = 30.0         # Scale down if predicted CPU < 30%
@@ -14,7 +19,39 @@ MIN_CONFIDENCE = 0.4          # Minimum confidence required for scaling
 # Cooldown to avoid thrashing (10 minutes as per spec)
 COOLDOWN_SECONDS = 600  # 10 minutes
 
+# How long describe_instances results are reused before hitting the EC2 API again
+INSTANCE_CACHE_TTL_SECONDS = 60
+
+# EC2 waiter polling (boto3 default is 15s x 40 attempts)
+WAITER_DELAY_SECONDS = 5
+WAITER_MAX_ATTEMPTS = 60
+
+# CPU predictor: "onnx" (onnxruntime) or "treelite" (tl2cgen-compiled .so), both
+# falling back to XGBoost if unavailable, or "xgboost"
+PREDICTOR_BACKEND = os.getenv("PREDICTOR_BACKEND", "onnx").lower()
+
+# Coalesce concurrent predict_cpu calls into batched model calls (worth it
+# only when many requests predict at once, e.g. a multi-client API)
+PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "False").lower() == "true"
+PREDICT_BATCH_MAX = 32
+PREDICT_BATCH_WAIT_MS = 2.0
+PREDICT_BATCH_TIMEOUT_SECONDS = 5.0
+
+# Metrics CSV tail parser: "pyarrow" (falls back to pandas if not installed) or "pandas"
+CSV_READER = os.getenv("CSV_READER", "pyarrow").lower()
+
 # Dry-run mode (set to False for actual scaling)
 DRY_RUN = os.getenv("DRY_RUN", "True").lower() == "true"
 
+# Shared by every process (append-only); rotate externally, e.g. logrotate
 LOG_FILE = "logs/autoscaler.log"
+
+# Binary live-metrics log (data/live_buffer.bin) is compacted past this size
+LIVE_LOG_MAX_BYTES = 4 * 1024 * 1024
+
+# Last autoscale decision, shared between the daemon and the API server
+STATUS_FILE = "data/autoscale_status.json"
+
+# Last scaling action (wall-clock epoch), so the cooldown holds across the
+# daemon, the API server and its workers
+COOLDOWN_FILE = "data/cooldown_state.json"
@@ -0,0 +1,216 @@
+# backend/core.py
+
+import os
+import orjson
+import logging
+import threading
+import traceback
+import datetime
+from data.fetch_live_metrics import fetch_live_metrics, save_live_buffer_async
+from ml.inference import predict_cpu_result
+from decision.scaling_policy import decide_action, is_in_cooldown, try_begin_action, end_action
+from aws.ec2_controller import get_instance_type, scale_up, scale_down
+from backend.config import DRY_RUN, STATUS_FILE
+
+# In-memory snapshot of the last autoscale decision.
+LAST_AUTOSCALE_STATUS = {
+    "timestamp": None,
+    "predicted_cpu": None,
+    "confidence": None,
+    "decision": "noop",
+    "reason": None,
+    "current_instance_type": None,
+    "action_taken": None,
+    "dry_run": DRY_RUN,
+}
+
+
+def _save_status(status):
+    """
+    Persist the status snapshot so other processes can read it.
+
+    The daemon runs cycles in its own process, so the API's /autoscale_status
+    reads this file rather than its own (possibly never updated) memory.
+    """
+    try:
+        os.makedirs(os.path.dirname(STATUS_FILE), exist_ok=True)
+        # Per-thread temp name: concurrent cycles must not replace each other's file
+        temp_path = f"{STATUS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(status))
+        os.replace(temp_path, STATUS_FILE)
+    except Exception as e:
+        logging.error(f"Failed to save autoscale status: {e}")
+
+
+def get_last_status():
+    """Return the most recent autoscale decision from any process."""
+    try:
+        with open(STATUS_FILE, "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return LAST_AUTOSCALE_STATUS
+    except Exception as e:
+        logging.error(f"Failed to read autoscale status: {e}")
+        return LAST_AUTOSCALE_STATUS
+
+
+def _cooldown_response(remaining):
+    """
+    Build the response for a cycle skipped because of the scaling cooldown.
+
+    No prediction is made, so the last predicted_cpu/confidence are carried
+    over for the dashboard; the instance type comes from the instance cache.
+    """
+    try:
+        current_instance_type, _ = get_instance_type()
+    except Exception as e:
+        logging.error(f"Failed to get instance type: {e}")
+        current_instance_type = "unknown"
+
+    reason = f"Cooldown active: {remaining}s remaining"
+    logging.info(f"Decision: NO ACTION - {reason} (skipped fetch and inference)")
+
+    global LAST_AUTOSCALE_STATUS
+    LAST_AUTOSCALE_STATUS = {
+        **LAST_AUTOSCALE_STATUS,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "decision": "noop",
+        "reason": reason,
+        "current_instance_type": current_instance_type,
+        "action_taken": "none",
+    }
+    _save_status(LAST_AUTOSCALE_STATUS)
+    return dict(LAST_AUTOSCALE_STATUS)
+
+
+def run_autoscale_cycle():
+    """
+    Run one fetch -> predict -> decide -> scale cycle.
+
+    Shared by the /autoscale endpoint and the daemon, which calls it directly
+    instead of going through HTTP.
+
+    Returns:
+        dict with the decision snapshot (plus "aws_result" if a scaling call ran)
+
+    Raises:
+        FileNotFoundError, ValueError or any other error from the pipeline;
+        callers decide how to surface it.
+    """
+    # No scaling can happen during cooldown, so skip fetch + inference entirely
+    in_cooldown, remaining = is_in_cooldown()
+    if in_cooldown:
+        return _cooldown_response(remaining)
+
+    # Step 1: Fetch metrics from Prometheus
+    logging.info("Fetching live metrics from Prometheus...")
+    df = fetch_live_metrics()
+
+    # Step 2: Save to live_buffer.csv atomically (audit copy, in the background)
+    save_live_buffer_async(df)
+
+    # Step 3 & 4: Build features and predict CPU from the in-memory window
+    logging.info("Running inference...")
+    prediction = predict_cpu_result(df=df)
+    predicted_cpu = prediction.predicted_cpu
+    confidence = prediction.confidence
+
+    # Step 5: Apply scaling policy
+    logging.info(f"Predicted CPU: {predicted_cpu:.2f}%, Confidence: {confidence:.3f}")
+    decision = decide_action(
+        predicted_cpu=predicted_cpu,
+        confidence=confidence,
+        anomaly_severity=0.0
+    )
+
+    # Claim the cooldown before touching the instance: another cycle (a
+    # concurrent /autoscale call, or the daemon) may have decided to scale too
+    if decision["action"] in ("scale_up", "scale_down"):
+        claimed, remaining = try_begin_action(decision["action"])
+        if not claimed:
+            decision = {
+                "action": "noop",
+                "reason": f"Cooldown active: {remaining}s remaining (another cycle is scaling)",
+            }
+
+    # Step 6: Get current instance type
+    try:
+        current_instance_type, current_state = get_instance_type()
+    except Exception as e:
+        logging.error(f"Failed to get instance type: {e}")
+        current_instance_type = "unknown"
+        current_state = "unknown"
+
+    # Step 7: Execute scaling action
+    action_taken = "none"
+    aws_result = None
+
+    if decision["action"] == "scale_up":
+        logging.info(f"Decision: SCALE UP - {decision['reason']}")
+        try:
+            aws_result = scale_up()
+            if aws_result.get("success"):
+                action_taken = "scale_up"
+                logging.info(f"✅ Scale up successful: {aws_result.get('old_type')} -> {aws_result.get('new_type')}")
+            else:
+                logging.warning(f"Scale up skipped: {aws_result.get('reason')}")
+        except Exception as e:
+            logging.error(f"Scale up failed: {e}")
+            logging.error(traceback.format_exc())
+        finally:
+            end_action("scale_up", success=action_taken == "scale_up")
+
+    elif decision["action"] == "scale_down":
+        logging.info(f"Decision: SCALE DOWN - {decision['reason']}")
+        try:
+            aws_result = scale_down()
+            if aws_result.get("success"):
+                action_taken = "scale_down"
+                logging.info(f"✅ Scale down successful: {aws_result.get('old_type')} -> {aws_result.get('new_type')}")
+            else:
+                logging.warning(f"Scale down skipped: {aws_result.get('reason')}")
+        except Exception as e:
+            logging.error(f"Scale down failed: {e}")
+            logging.error(traceback.format_exc())
+        finally:
+            end_action("scale_down", success=action_taken == "scale_down")
+
+    else:
+        logging.info(f"Decision: NO ACTION - {decision['reason']}")
+
+    # Structured log entry
+    now_dt = datetime.datetime.now()
+    timestamp = now_dt.strftime("%Y-%m-%d %H:%M:%S")
+    log_entry = (
+        f"timestamp={timestamp} | "
+        f"current_instance_type={current_instance_type} | "
+        f"predicted_cpu={predicted_cpu:.2f} | "
+        f"confidence={confidence:.3f} | "
+        f"decision={decision['action']} | "
+        f"action_taken={action_taken} | "
+        f"reason={decision['reason']}"
+    )
+    logging.info(log_entry)
+
+    # Snapshot last autoscale status for read-only dashboard access.
+    global LAST_AUTOSCALE_STATUS
+    LAST_AUTOSCALE_STATUS = {
+        "timestamp": now_dt.isoformat(),
+        "predicted_cpu": predicted_cpu,
+        "confidence": confidence,
+        "decision": decision["action"],
+        "reason": decision["reason"],
+        "current_instance_type": current_instance_type,
+        "action_taken": action_taken,
+        "dry_run": DRY_RUN,
+    }
+    _save_status(LAST_AUTOSCALE_STATUS)
+
+    # Return response
+    response = dict(LAST_AUTOSCALE_STATUS)
+
+    if aws_result:
+        response["aws_result"] = aws_result
+
+    return response
@@ -0,0 +1,46 @@
+# backend/logging_setup.py
+
+import os
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+from backend.config import LOG_FILE
+
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+# One listener per process, started on first setup_logging() call
+_listener = None
+
+
+def setup_logging(level=logging.INFO):
+    """
+    Route logging through a queue so callers never block on disk I/O.
+
+    The root logger only gets a QueueHandler; a background QueueListener
+    thread owns the file handler for LOG_FILE and does the writes.
+    Safe to call more than once (later calls are no-ops).
+
+    The API, its workers and the daemon all append to the same LOG_FILE, so
+    no process rotates it: size-based rotation from several processes
+    renames files the others still have open. Rotate externally (e.g.
+    logrotate); WatchedFileHandler reopens LOG_FILE once it has been moved.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    file_handler = WatchedFileHandler(LOG_FILE)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT))
+
+    log_queue = queue.Queue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued on interpreter exit
+    atexit.register(_listener.stop)
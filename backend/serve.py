@@ -0,0 +1,40 @@
+# backend/serve.py
+
+"""
+Run the API with one process per core and one compute thread per process.
+
+Single-row inference gains nothing from intra-op threads, so throughput
+comes from more worker processes instead of more threads per model call.
+
+Usage:
+    python -m backend.serve
+
+Environment:
+    API_HOST / API_PORT  bind address (default 0.0.0.0:8000)
+    API_WORKERS          worker processes (default: number of CPUs)
+
+Note: the scaling cooldown is shared through COOLDOWN_FILE, so an action
+taken by any worker or the daemon holds off scaling in all of them.
+"""
+
+import os
+
+# Must be set before numpy / xgboost / onnxruntime are imported (the workers
+# inherit this environment)
+for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "XGBOOST_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+import uvicorn
+
+
+def main():
+    uvicorn.run(
+        "backend.main:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=int(os.getenv("API_WORKERS", os.cpu_count() or 1)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 import os
 import requests
+import numpy as np
 import pandas as pd
 import time
 import logging
-from backend.config import WINDOW_SECONDS
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from backend.config import WINDOW_SECONDS, STEP_SECONDS
 from aws.monitoring_setup import get_instance_ip
+from data.live_log import append_live_log
 
-STEP = "5s"
+STEP = f"{STEP_SECONDS}s"
 
 METRICS = {
     "cpu": "100 - (avg by(instance)(rate(node_cpu_seconds_total{mode='idle'}[1m])) * 100)",
@@ -14,6 +19,17 @@ METRICS = {
     "disk": "rate(node_disk_read_bytes_total[1m]) + rate(node_disk_written_bytes_total[1m])"
 }
 
+# Single writer so audit copies of the live buffer land in order
+_buffer_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-buffer-writer")
+
+# One pooled keep-alive session shared by the per-metric worker threads.
+# Transient Prometheus errors are retried here instead of failing the cycle.
+_retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=_retry)
+_session = requests.Session()
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
 
 def get_prometheus_url() -> str:
     """
@@ -23,8 +39,22 @@ def get_prometheus_url() -> str:
     ip = get_instance_ip()
     return f"http://{ip}:9090/api/v1/query_range"
 
-def fetch_metric(query, name, start, end):
-    """Fetch a single metric from Prometheus."""
+def _ffill(values):
+    """Forward-fill NaNs down each column of a 2-D array (DataFrame.ffill)."""
+    idx = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return values[idx, np.arange(values.shape[1])]
+
+def fetch_metric(query, name, start, end, prom_url=None):
+    """
+    Fetch a single metric from Prometheus.
+
+    Pass `prom_url` when fetching several metrics so the instance IP is
+    resolved once per cycle rather than once per query.
+
+    Returns:
+        float ndarray of shape (n, 2): unix timestamp, value
+    """
     params = {
         "query": query,
         "start": start,
@@ -33,24 +63,19 @@ def fetch_metric(query, name, start, end):
     }
     
     try:
-        prom_url = get_prometheus_url()
-        r = requests.get(prom_url, params=params, timeout=10)
+        if prom_url is None:
+            prom_url = get_prometheus_url()
+        r = _session.get(prom_url, params=params, timeout=10)
         r.raise_for_status()
 
         data = r.json().get("data", {}).get("result", [])
         
         if not data:
             logging.warning(f"No data returned for metric {name}")
-            return pd.DataFrame(columns=["timestamp", name])
+            return np.empty((0, 2))
 
-        values = data[0]["values"]
-        df = pd.DataFrame(values, columns=["timestamp", name])
-        
-        # Convert timestamp to datetime and value to float
-        df["timestamp"] = pd.to_datetime(df["timestamp"].astype(float), unit="s")
-        df[name] = df[name].astype(float)
-        
-        return df
+        # Prometheus returns [[<unix ts>, "<value>"], ...]
+        return np.asarray(data[0]["values"], dtype=np.float64)
 
     except Exception as e:
         logging.error(f"Failed to fetch metric {name}: {e}")
@@ -65,30 +90,53 @@ def fetch_live_metrics():
     """
     end = int(time.time())
     start = end - WINDOW_SECONDS
+    prom_url = get_prometheus_url()
+
+    # Queries are independent and IO-bound, so run them concurrently
+    with ThreadPoolExecutor(max_workers=len(METRICS)) as pool:
+        futures = {
+            name: pool.submit(fetch_metric, q, name, start, end, prom_url)
+            for name, q in METRICS.items()
+        }
 
-    dfs = {}
-    for name, q in METRICS.items():
+    # All queries share start/end/step, so every sample sits on the same
+    # grid: scatter each metric into its column by bucket index instead of
+    # outer-joining on float timestamps.
+    n_buckets = (end - start) // STEP_SECONDS + 1
+    grid = np.full((n_buckets, len(METRICS)), np.nan)
+    reported = np.zeros(n_buckets, dtype=bool)
+    present = []
+    for col, (name, future) in enumerate(futures.items()):
         try:
-            dfs[name] = fetch_metric(q, name, start, end)
+            samples = future.result()
         except Exception:
             # If a metric fails, we might want to return an empty DF or handle gracefully
             logging.error(f"Skipping metric {name} due to fetch error.")
-            dfs[name] = pd.DataFrame(columns=["timestamp", name])
+            continue
+        if len(samples) == 0:
+            continue
 
-    # Merge all metrics on timestamp
-    # Start with CPU as the base
-    df = dfs.get("cpu", pd.DataFrame(columns=["timestamp", "cpu"]))
-    
-    for k in ["ram", "disk"]:
-        if k in dfs and not dfs[k].empty:
-            df = df.merge(dfs[k], on="timestamp", how="outer")
+        # Rounding absorbs sub-step jitter in the returned timestamps
+        bucket = np.rint((samples[:, 0] - start) / STEP_SECONDS).astype(np.int64)
+        in_range = (bucket >= 0) & (bucket < n_buckets)
+        grid[bucket[in_range], col] = samples[in_range, 1]
+        reported[bucket[in_range]] = True
+        present.append(col)
 
-    if df.empty:
+    if not present:
         raise ValueError("No metrics fetched from Prometheus.")
 
-    df.sort_values("timestamp", inplace=True)
-    df.ffill(inplace=True)
-    df.bfill(inplace=True)  # Fill any remaining NaNs
+    # Keep only buckets at least one metric reported, then fill gaps
+    # forward and then backward (leading NaNs)
+    grid = grid[:, present]
+    rows = np.flatnonzero(reported)
+    grid = _ffill(grid[rows])
+    grid = _ffill(grid[::-1])[::-1]
+
+    names = list(METRICS)
+    df = pd.DataFrame(grid, columns=[names[col] for col in present])
+    timestamps = pd.to_datetime(start + rows * STEP_SECONDS, unit="s").as_unit("ns")
+    df.insert(0, "timestamp", timestamps)
 
     return df
 
@@ -112,4 +160,27 @@ def save_live_buffer(df, csv_path="data/live_buffer.csv"):
         logging.info(f"Saved {len(df)} rows to {csv_path}")
     except Exception as e:
         logging.error(f"Failed to save live buffer: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def _save_live_buffer_and_log(df, csv_path):
+    """Write the CSV audit copy, then append new rows to the binary live log."""
+    save_live_buffer(df, csv_path)
+    try:
+        append_live_log(df)
+    except Exception as e:
+        logging.error(f"Failed to append live log: {e}")
+        raise
+
+def save_live_buffer_async(df, csv_path="data/live_buffer.csv"):
+    """
+    Queue save_live_buffer (plus the binary live log append) on a background
+    writer and return immediately.
+
+    The autoscale cycle hands its DataFrame straight to inference, so the CSV
+    is only an audit copy and shouldn't hold up the request. Failures are
+    logged by the writers themselves.
+
+    Returns:
+        concurrent.futures.Future for the write
+    """
+    return _buffer_writer.submit(_save_live_buffer_and_log, df, csv_path)
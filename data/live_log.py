@@ -0,0 +1,151 @@
+# data/live_log.py
+
+"""
+Append-only binary log of live metrics (data/live_buffer.bin).
+
+Fixed-size little-endian records (int64 epoch ms, float64 cpu, ram, disk),
+so reading the newest N rows is a seek + np.fromfile with no parsing.
+Written alongside the CSV audit copy by every process that fetches metrics
+(daemon, API, serve workers); appends and compaction are serialized by a
+lock file.
+"""
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from backend.config import LIVE_LOG_MAX_BYTES, STEP_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: writes are serialized within one process only
+    fcntl = None
+
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<i8"),  # epoch milliseconds (UTC-naive, like the CSV)
+    ("cpu", "<f8"),
+    ("ram", "<f8"),
+    ("disk", "<f8"),
+])
+
+LIVE_LOG_PATH = os.path.realpath(
+    os.path.join(os.path.dirname(__file__), "live_buffer.bin")
+)
+
+# Serializes writers in this process; the flock on path + ".lock" does the
+# same across processes
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def _log_lock(path):
+    """Hold the write lock for the log at path, in this process and (where supported) across processes."""
+    with _write_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _last_timestamp(path):
+    """Epoch-ms timestamp of the last complete record, or None if there is none."""
+    try:
+        count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+    except FileNotFoundError:
+        return None
+    if count == 0:
+        return None
+    last = np.fromfile(path, dtype=RECORD_DTYPE, count=1, offset=(count - 1) * RECORD_DTYPE.itemsize)
+    return int(last["timestamp"][0])
+
+
+def append_live_log(df, path=LIVE_LOG_PATH):
+    """
+    Append the rows of df newer than the last logged record.
+
+    Consecutive fetch windows overlap, so only new timestamps are written.
+    Once the file exceeds LIVE_LOG_MAX_BYTES it is compacted (atomically)
+    to its newest half. The check, append and compaction run under the
+    log's lock, so concurrent writers neither duplicate nor lose records.
+
+    Args:
+        df: DataFrame with columns ['timestamp', 'cpu', 'ram', 'disk']
+        path: Log file path
+
+    Returns:
+        Number of records appended
+    """
+    records = np.empty(len(df), dtype=RECORD_DTYPE)
+    records["timestamp"] = df["timestamp"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+    for name in ("cpu", "ram", "disk"):
+        records[name] = df[name].to_numpy(dtype=np.float64)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _log_lock(path):
+        last_ts = _last_timestamp(path)
+        if last_ts is not None:
+            records = records[records["timestamp"] > last_ts]
+        if len(records) == 0:
+            return 0
+
+        with open(path, "ab") as f:
+            # Drop a torn trailing record (interrupted write) before appending
+            f.truncate(f.tell() - f.tell() % RECORD_DTYPE.itemsize)
+            f.write(records.tobytes())
+            size = f.tell()
+
+        if size > LIVE_LOG_MAX_BYTES:
+            keep = LIVE_LOG_MAX_BYTES // 2 // RECORD_DTYPE.itemsize
+            tail = read_live_log_tail(keep, path)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            tail.tofile(temp_path)
+            os.replace(temp_path, path)
+            logging.info(f"Compacted {path} to its newest {len(tail)} records")
+
+    return len(records)
+
+
+def read_live_log_tail(n_rows, path=LIVE_LOG_PATH):
+    """
+    Read the newest n_rows records (fewer if the log is shorter).
+
+    Raises:
+        FileNotFoundError: If the log doesn't exist
+
+    Returns:
+        Structured array with RECORD_DTYPE fields
+    """
+    count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+    start = max(count - n_rows, 0)
+    return np.fromfile(
+        path, dtype=RECORD_DTYPE, count=count - start, offset=start * RECORD_DTYPE.itemsize
+    )
+
+
+def newest_contiguous(records, max_gap_ms=STEP_SECONDS * 1000):
+    """
+    Trailing run of records with no gap between samples wider than max_gap_ms.
+
+    The log joins fetch windows across skipped fetches (cooldown) and daemon
+    downtime; lag and rolling features are only meaningful over an unbroken
+    run, like the single window the in-memory /autoscale path predicts from.
+    """
+    gaps = np.flatnonzero(np.diff(records["timestamp"]) > max_gap_ms)
+    return records if len(gaps) == 0 else records[gaps[-1] + 1:]
+
+
+def records_to_frame(records):
+    """DataFrame with the same columns/dtypes as the CSV reader produces."""
+    return pd.DataFrame({
+        "timestamp": records["timestamp"].astype("datetime64[ms]").astype("datetime64[ns]"),
+        "cpu": records["cpu"],
+        "ram": records["ram"],
+        "disk": records["disk"],
+    })
@@ -1,17 +1,169 @@
 # decision/scaling_policy.py
 
+import os
 import time
+import orjson
 import logging
+import threading
+from contextlib import contextmanager
 from backend.config import (
     SCALE_UP_CPU, 
     SCALE_DOWN_CPU, 
     MIN_CONFIDENCE,
-    COOLDOWN_SECONDS
+    COOLDOWN_SECONDS,
+    COOLDOWN_FILE,
+    WAITER_DELAY_SECONDS,
+    WAITER_MAX_ATTEMPTS,
 )
 
-# Module-level state for cooldown tracking
-_last_action_time = 0
+try:
+    import fcntl
+except ImportError:  # non-POSIX: claims are atomic within one process only
+    fcntl = None
+
+# Module-level state for cooldown tracking. Times come from time.monotonic()
+# so NTP/clock adjustments can't stretch or skip a cooldown; None means no
+# action yet (monotonic time has no meaningful zero). _pending_since is set
+# while a claimed action (see try_begin_action) is still running.
+_last_action_time = None
 _last_action = None
+_pending_since = None
+
+# Serializes try_begin_action/end_action across threads (sync FastAPI
+# handlers run on a threadpool); the flock on _CLAIM_LOCK_FILE does the same
+# across processes. Reentrant because claiming checks is_in_cooldown.
+_state_lock = threading.RLock()
+_CLAIM_LOCK_FILE = COOLDOWN_FILE + ".lock"
+
+# A claim older than the longest a scaling action can take (stop + start
+# waiters) is treated as abandoned, e.g. by a process that died mid-action
+_MAX_ACTION_SECONDS = 2 * WAITER_DELAY_SECONDS * WAITER_MAX_ATTEMPTS
+
+# Other processes (daemon vs API, API workers) only see actions through
+# COOLDOWN_FILE, which stores wall-clock time since monotonic clocks aren't
+# comparable across processes.
+
+def _read_shared_state():
+    """Last action recorded by any process, from COOLDOWN_FILE ({} if none)."""
+    try:
+        with open(COOLDOWN_FILE, "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.error(f"Failed to read cooldown state: {e}")
+        return {}
+
+def _write_shared_state(state):
+    """Atomically replace COOLDOWN_FILE with `state`."""
+    try:
+        os.makedirs(os.path.dirname(COOLDOWN_FILE), exist_ok=True)
+        temp_path = f"{COOLDOWN_FILE}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(state))
+        os.replace(temp_path, COOLDOWN_FILE)
+    except Exception as e:
+        logging.error(f"Failed to save cooldown state: {e}")
+
+@contextmanager
+def _claim_lock():
+    """Hold the cooldown claim lock, in this process and (where supported) across processes."""
+    with _state_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(_CLAIM_LOCK_FILE), exist_ok=True)
+        with open(_CLAIM_LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _wall_clock_remaining(since, duration):
+    """
+    Seconds left of `duration` started at wall-clock `since` (another process's
+    time.time()), clamped to [0, duration] so a clock step can neither extend
+    it past its length nor make it negative.
+    """
+    return min(max(duration - (time.time() - since), 0.0), duration)
+
+def is_in_cooldown():
+    """
+    Check whether the post-scaling cooldown is still running (no side effects).
+
+    Covers actions taken by this process (monotonic clock) and, via
+    COOLDOWN_FILE, by any other (wall clock, clamped; entries written by this
+    process are skipped there). An action that has been claimed but hasn't
+    finished yet also counts; its cooldown only starts once it completes, so
+    the full COOLDOWN_SECONDS is reported as remaining.
+
+    Returns:
+        (in_cooldown, remaining_seconds) - remaining is 0 when not in cooldown
+    """
+    last_action_time, pending_since = _last_action_time, _pending_since
+    shared = _read_shared_state()
+    pid = os.getpid()
+
+    if pending_since is not None and time.monotonic() - pending_since < _MAX_ACTION_SECONDS:
+        return True, COOLDOWN_SECONDS
+    shared_pending = shared.get("pending_since")
+    if (
+        shared_pending is not None
+        and shared.get("pending_pid") != pid
+        and _wall_clock_remaining(shared_pending, _MAX_ACTION_SECONDS) > 0
+    ):
+        return True, COOLDOWN_SECONDS
+
+    remaining = 0.0
+    if last_action_time is not None:
+        remaining = COOLDOWN_SECONDS - (time.monotonic() - last_action_time)
+    shared_time = shared.get("last_action_time")
+    if shared_time is not None and shared.get("last_action_pid") != pid:
+        remaining = max(remaining, _wall_clock_remaining(shared_time, COOLDOWN_SECONDS))
+
+    if remaining > 0:
+        return True, int(remaining)
+    return False, 0
+
+def try_begin_action(action):
+    """
+    Atomically check the cooldown and, if it has expired, claim it for `action`.
+
+    Check and claim happen under one lock (thread + file lock), so of several
+    concurrent cycles that all decided to scale, exactly one proceeds. Every
+    successful claim must be followed by end_action().
+
+    Returns:
+        (claimed, remaining_seconds) - remaining is the cooldown left when
+        the claim was refused, 0 otherwise
+    """
+    global _pending_since
+    with _claim_lock():
+        in_cooldown, remaining = is_in_cooldown()
+        if in_cooldown:
+            return False, remaining
+        _pending_since = time.monotonic()
+        shared = _read_shared_state()
+        shared.update(pending_action=action, pending_since=time.time(), pending_pid=os.getpid())
+        _write_shared_state(shared)
+    return True, 0
+
+def end_action(action, success):
+    """
+    Release a claim from try_begin_action: start the cooldown if the action
+    succeeded, otherwise restore the previous cooldown state.
+    """
+    global _pending_since
+    with _claim_lock():
+        _pending_since = None
+        if success:
+            record_action(action)
+        else:
+            shared = _read_shared_state()
+            for key in ("pending_action", "pending_since", "pending_pid"):
+                shared.pop(key, None)
+            _write_shared_state(shared)
 
 def decide_action(predicted_cpu, confidence, anomaly_severity=0.0):
     """
@@ -27,14 +179,9 @@ def decide_action(predicted_cpu, confidence, anomaly_severity=0.0):
             - action: "scale_up" | "scale_down" | "noop"
             - reason: str (explanation)
     """
-    global _last_action_time, _last_action
-    
-    now = time.time()
-
     # Check cooldown
-    time_since_last_action = now - _last_action_time
-    if time_since_last_action < COOLDOWN_SECONDS:
-        remaining = int(COOLDOWN_SECONDS - time_since_last_action)
+    in_cooldown, remaining = is_in_cooldown()
+    if in_cooldown:
         return {
             "action": "noop",
             "reason": f"Cooldown active: {remaining}s remaining"
@@ -68,7 +215,13 @@ def decide_action(predicted_cpu, confidence, anomaly_severity=0.0):
     }
 
 def record_action(action):
-    """Record that an action was taken (for cooldown tracking)."""
+    """Record that an action was taken (for cooldown tracking, in every process)."""
     global _last_action_time, _last_action
-    _last_action_time = time.time()
-    _last_action = action
+    with _state_lock:
+        _last_action_time = time.monotonic()
+        _last_action = action
+        _write_shared_state({
+            "last_action_time": time.time(),
+            "last_action": action,
+            "last_action_pid": os.getpid(),
+        })
@@ -0,0 +1,26 @@
+# ml/_hot.py
+
+from numba import njit
+
+
+@njit(cache=True)
+def scale_row(values, indices, mean, inv_scale, out):
+    """
+    Gather and standardize one feature row in a single compiled loop.
+
+    out[i] = (values[indices[i]] - mean[i]) * inv_scale[i], i.e. the
+    StandardScaler transform of the scaler-ordered features. The math runs
+    in float64 and only the result is rounded into `out` (float32 for the
+    model), matching sklearn's transform followed by XGBoost's input cast.
+    At ~40 elements, NumPy's per-op dispatch and temporaries cost far more
+    than the arithmetic.
+
+    Args:
+        values: float64 feature row, in build order
+        indices: intp positions of the scaler's features within `values`
+        mean: float64 scaler means
+        inv_scale: float64 reciprocal scaler scales
+        out: float32 output row (same length as indices), written in place
+    """
+    for i in range(indices.shape[0]):
+        out[i] = (values[indices[i]] - mean[i]) * inv_scale[i]
@@ -0,0 +1,94 @@
+# ml/batcher.py
+
+import queue
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
+
+
+class PredictionBatcher:
+    """
+    Coalesce concurrent single-row predictions into one model call.
+
+    Callers (e.g. FastAPI's threadpool workers) block in submit() while a
+    single background thread drains the queue: it waits up to max_wait_ms
+    after the first pending row, or until max_batch rows are queued, then
+    runs predict_fn once on the stacked (k, n_features) float32 batch and
+    hands each caller its own output. The per-call overhead of the
+    predictor is paid once per batch instead of once per row.
+
+    Every submitted row is resolved, with its prediction or an exception,
+    and callers give up after `timeout_s` rather than waiting forever.
+    """
+
+    def __init__(self, predict_fn, max_batch=32, max_wait_ms=2.0, timeout_s=5.0):
+        """
+        Args:
+            predict_fn: Callable mapping a (k, n_features) float32 array to k predictions
+            max_batch: Largest batch passed to predict_fn
+            max_wait_ms: How long the first queued row waits for company
+            timeout_s: How long submit() waits for its prediction
+        """
+        self._predict_fn = predict_fn
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000.0
+        self._timeout = timeout_s
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, row):
+        """
+        Queue one scaled feature row and wait for its prediction.
+
+        Args:
+            row: (n_features,) array, already scaled
+
+        Returns:
+            float prediction for this row (model errors are re-raised here)
+
+        Raises:
+            TimeoutError: No prediction within timeout_s
+        """
+        future = Future()
+        self._queue.put((row, future))
+        try:
+            return future.result(timeout=self._timeout)
+        except FutureTimeoutError:
+            # Drop the row if the worker hasn't picked it up yet
+            future.cancel()
+            raise TimeoutError(f"Batched prediction timed out after {self._timeout}s")
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self._max_wait
+            while len(pending) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Skip rows whose caller already timed out; the rest can no
+            # longer be cancelled, so each of them gets a result below
+            pending = [(row, future) for row, future in pending if future.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+
+            try:
+                batch = np.vstack([row for row, _ in pending]).astype(np.float32, copy=False)
+                preds = [float(pred) for pred in np.ravel(self._predict_fn(batch))]
+                if len(preds) != len(pending):
+                    raise ValueError(f"predict_fn returned {len(preds)} predictions for {len(pending)} rows")
+            except Exception as e:
+                logging.error(f"Batched prediction failed for {len(pending)} rows: {e}")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            for (_, future), pred in zip(pending, preds):
+                future.set_result(pred)
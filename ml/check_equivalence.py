@@ -0,0 +1,82 @@
+# ml/check_equivalence.py
+
+"""
+Check the serving path against the float64 training pipeline on many windows.
+
+Run after changing feature building, scaling or the predictor backend:
+    python -m ml.check_equivalence            # 200 windows
+    python -m ml.check_equivalence 1000
+
+For each HISTORY_ROWS-row window of artifacts/dataset-800min.csv, the
+reference is what the training notebook does: build_features (float64) ->
+sklearn StandardScaler.transform (float64) -> XGBRegressor.predict, which
+casts to float32 only at the model input. The serving path must feed the
+model the exact same float32 row, bit for bit: one ulp of earlier rounding
+is enough to flip a tree split and move the prediction by whole CPU
+points, far beyond any useful tolerance. Predictions then only need to
+agree to PREDICTION_ATOL, which absorbs the backends' summation order.
+
+Needs scikit-learn (like ml.export_models); exits non-zero on a mismatch.
+"""
+
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from ml.load_models import TAB_SCALER_JOBLIB_PATH
+from ml.feature_builder import build_features, FEATURE_NAMES, HISTORY_ROWS
+from ml.inference import model_input, predict_cpu_result
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), "..", "artifacts", "dataset-800min.csv")
+XGB_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "artifacts", "xgboost_model_final.json")
+
+# ONNX / Treelite sum the trees in a different order than XGBoost
+PREDICTION_ATOL = 1e-3
+
+
+def check_equivalence(n_windows=200):
+    """
+    Compare serving inputs and predictions with the reference pipeline.
+
+    Args:
+        n_windows: Number of evenly spaced windows to replay
+
+    Returns:
+        List of (window_start, problem) tuples; empty if everything matches
+    """
+    data = pd.read_csv(DATASET_PATH, parse_dates=["timestamp"])[["timestamp", "cpu", "ram", "disk"]]
+    sk_scaler = joblib.load(TAB_SCALER_JOBLIB_PATH)
+    columns = list(getattr(sk_scaler, "feature_names_in_", FEATURE_NAMES))
+    regressor = xgb.XGBRegressor()
+    regressor.load_model(XGB_MODEL_PATH)
+
+    problems = []
+    starts = np.linspace(0, len(data) - HISTORY_ROWS, n_windows).astype(int)
+    for start in starts:
+        window = data.iloc[start:start + HISTORY_ROWS].reset_index(drop=True)
+
+        feats = build_features(window).iloc[[-1]][columns]
+        ref_scaled = sk_scaler.transform(feats)
+        ref_pred = float(regressor.predict(ref_scaled)[0])
+
+        X_scaled, _ = model_input(window)
+        if not np.array_equal(X_scaled, ref_scaled.astype(np.float32)):
+            n_diff = int((X_scaled != ref_scaled.astype(np.float32)).sum())
+            problems.append((start, f"model input differs in {n_diff} feature(s)"))
+            continue
+        pred = predict_cpu_result(df=window).predicted_cpu
+        if abs(pred - ref_pred) > PREDICTION_ATOL:
+            problems.append((start, f"prediction {pred:.4f} != reference {ref_pred:.4f}"))
+    return problems
+
+
+if __name__ == "__main__":
+    n_windows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    problems = check_equivalence(n_windows)
+    for start, problem in problems:
+        print(f"❌ window at row {start}: {problem}")
+    if problems:
+        sys.exit(f"{len(problems)} of {n_windows} windows disagree with the training pipeline")
+    print(f"✅ {n_windows} windows match the training pipeline")
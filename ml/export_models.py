@@ -0,0 +1,121 @@
+# ml/export_models.py
+
+"""
+Compile the trained XGBoost model for the faster predictor backends.
+
+Run once after (re)training:
+    python -m ml.export_models            # scaler NPZ, ONNX and Treelite
+    python -m ml.export_models onnx       # just one of them
+
+Export needs scikit-learn (scaler), onnxmltools / treelite + tl2cgen (and
+gcc for Treelite); serving needs just numpy / onnxruntime / tl2cgen.
+Then check the result with `python -m ml.check_equivalence`.
+"""
+
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+from ml.load_models import (
+    get_xgb_model,
+    scaler_from_sklearn,
+    ONNX_MODEL_PATH,
+    ONNX_INPUT_NAME,
+    TL_MODEL_PATH,
+    TAB_SCALER_JOBLIB_PATH,
+    TAB_SCALER_NPZ_PATH,
+)
+from ml.feature_builder import FEATURE_NAMES
+
+
+def export_scaler(output_path=TAB_SCALER_NPZ_PATH):
+    """
+    Save the fitted StandardScaler as plain arrays (mean, scale, feature_names).
+
+    Loading it is a single np.load with no pickle or sklearn import. The
+    arrays stay float64 so scaling matches the sklearn scaler exactly;
+    the exported parameters are checked against transform() first.
+
+    Args:
+        output_path: Where to write the .npz file
+
+    Returns:
+        output_path
+    """
+    sk_scaler = joblib.load(TAB_SCALER_JOBLIB_PATH)
+    scaler = scaler_from_sklearn(sk_scaler)
+
+    probe = (scaler.mean + np.linspace(-3.0, 3.0, len(scaler.mean)) * scaler.scale)[None, :]
+    if scaler.feature_names_in_:
+        expected = sk_scaler.transform(pd.DataFrame(probe, columns=list(scaler.feature_names_in_)))
+    else:
+        expected = sk_scaler.transform(probe)
+    if not np.allclose((probe - scaler.mean) / scaler.scale, expected):
+        raise ValueError("Exported scaler parameters disagree with StandardScaler.transform")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    np.savez(
+        output_path,
+        mean=scaler.mean,
+        scale=scaler.scale,
+        feature_names=np.array(scaler.feature_names_in_, dtype=str),
+    )
+    return output_path
+
+
+def export_onnx(output_path=ONNX_MODEL_PATH):
+    """
+    Convert the XGBoost booster to ONNX (float32 input, FEATURE_NAMES order).
+
+    Args:
+        output_path: Where to write the .onnx file
+
+    Returns:
+        output_path
+    """
+    from onnxmltools import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+
+    onnx_model = convert_xgboost(
+        get_xgb_model(),
+        initial_types=[(ONNX_INPUT_NAME, FloatTensorType([None, len(FEATURE_NAMES)]))],
+        target_opset=15,
+    )
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+    return output_path
+
+
+def export_treelite(output_path=TL_MODEL_PATH):
+    """
+    Compile the XGBoost booster to a native shared library with Treelite/TL2cgen.
+
+    The library is machine-specific (it is built with the local gcc), so it
+    is not committed; rebuild it on each host that uses PREDICTOR_BACKEND=treelite.
+
+    Args:
+        output_path: Where to write the .so file
+
+    Returns:
+        output_path
+    """
+    import treelite
+    import tl2cgen
+
+    # From the loaded booster, so only the early-stopped trees are compiled
+    model = treelite.frontend.from_xgboost(get_xgb_model())
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tl2cgen.export_lib(model, toolchain="gcc", libpath=output_path, params={"parallel_comp": 8})
+    return output_path
+
+
+EXPORTERS = {"scaler": export_scaler, "onnx": export_onnx, "treelite": export_treelite}
+
+
+if __name__ == "__main__":
+    for target in sys.argv[1:] or list(EXPORTERS):
+        if target not in EXPORTERS:
+            sys.exit(f"Unknown export target: {target} (choose from {', '.join(EXPORTERS)})")
+        print(f"✅ {target} export written to {EXPORTERS[target]()}")
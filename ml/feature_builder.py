@@ -1,96 +1,441 @@
 # ml/feature_builder.py
 
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import IsolationForest
+from numba import njit
+from numpy.lib.stride_tricks import sliding_window_view
+from ml.load_models import get_iso_forest
 
 ROLL_WIN = 60
-RANDOM_SEED = 42
 
-def build_features(df):
+# Rows of history that can still influence the newest feature row. Everything
+# but the EWM is bounded by ROLL_WIN + 1; at span 30, rows older than this
+# carry < 1e-6 of the EWM weight.
+HISTORY_ROWS = 4 * ROLL_WIN
+
+# Lag and rolling-window settings (match training, Cell 15)
+LAGS = (1, 2, 3, 6, 12)
+WINDOWS = {"short": 3, "med": 12, "long": 60}  # ~15s, 60s, 5min
+
+# Model input columns, in the exact order the scaler/model were fitted on
+FEATURE_NAMES: tuple[str, ...] = (
+    "cpu", "ram", "disk",
+    "cpu_roll_median_past", "cpu_roll_std_past", "cpu_zscore_past",
+    "is_anomaly_z", "is_anomaly_iso", "anomaly_severity",
+    "hour", "minute", "dayofweek", "hour_sin", "hour_cos",
+    "cpu_lag_1", "ram_lag_1", "disk_lag_1",
+    "cpu_lag_2", "ram_lag_2", "disk_lag_2",
+    "cpu_lag_3", "ram_lag_3", "disk_lag_3",
+    "cpu_lag_6", "ram_lag_6", "disk_lag_6",
+    "cpu_lag_12", "ram_lag_12", "disk_lag_12",
+    "cpu_roll_mean_short", "cpu_roll_std_short", "ram_roll_mean_short", "disk_roll_mean_short",
+    "cpu_roll_mean_med", "cpu_roll_std_med", "ram_roll_mean_med", "disk_roll_mean_med",
+    "cpu_roll_mean_long", "cpu_roll_std_long", "ram_roll_mean_long", "disk_roll_mean_long",
+    "cpu_ewm_30", "cpu_x_ram",
+)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+# Fewest input rows that yield a complete feature row (max lag 12, window 60)
+MIN_ROWS = max(ROLL_WIN, max(LAGS)) + 1
+
+# Column positions, resolved once so build_features never formats names
+CPU_IDX, RAM_IDX, DISK_IDX = 0, 1, 2
+ROLL_MEDIAN_PAST_IDX = 3
+ROLL_STD_PAST_IDX = 4
+ZSCORE_PAST_IDX = 5
+IS_ANOMALY_Z_IDX = 6
+IS_ANOMALY_ISO_IDX = 7
+ANOMALY_SEVERITY_IDX = 8
+HOUR_IDX, MINUTE_IDX, DAYOFWEEK_IDX = 9, 10, 11
+HOUR_SIN_IDX, HOUR_COS_IDX = 12, 13
+CPU_LAG_1_IDX = 14  # followed by ram/disk, then the next lag
+ROLL_SHORT_IDX = 29  # cpu mean, cpu std, ram mean, disk mean per window
+CPU_EWM_30_IDX = 41
+CPU_X_RAM_IDX = 42
+
+# Hour-of-day encodings, precomputed for the 24 possible hours
+_HOUR_SIN = np.sin(2 * np.pi * np.arange(24) / 24)
+_HOUR_COS = np.cos(2 * np.pi * np.arange(24) / 24)
+
+
+# NumPy equivalents of the pandas ops used in training. The live window is
+# only ~60 rows, so per-op pandas dispatch costs far more than the math.
+
+def _shift(values, lag):
+    """Equivalent of Series.shift(lag): move values down, pad the top with NaN."""
+    out = np.full(len(values), np.nan)
+    out[lag:] = values[:len(values) - lag]
+    return out
+
+def _trailing_windows(values, window):
+    """(n, window) view of each row's trailing window, NaN-padded at the start."""
+    padded = np.concatenate([np.full(window - 1, np.nan), values])
+    return sliding_window_view(padded, window)
+
+def _rolling_mean_std(values, window):
+    """Equivalent of rolling(window, min_periods=1).mean() / .std() (ddof=1)."""
+    windows = _trailing_windows(values, window)
+    valid = ~np.isnan(windows)
+    count = valid.sum(axis=1)
+    mean = np.where(valid, windows, 0.0).sum(axis=1) / count
+    sq_dev = np.where(valid, windows - mean[:, None], 0.0) ** 2
+    std = np.full(len(values), np.nan)
+    np.sqrt(sq_dev.sum(axis=1) / np.maximum(count - 1, 1), out=std, where=count > 1)
+    return mean, std
+
+def _ewm_mean(values, span):
+    """
+    Equivalent of ewm(span=span, adjust=False).mean() (ignore_na=False).
+
+    NaN rows output the previous mean and leave it unchanged, but still
+    decay its weight, so the first value after a gap of k NaN gets weight
+    alpha against (1 - alpha) ** (k + 1) for the old mean, as in pandas.
+    Output is NaN only before the first non-NaN value.
+    """
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    out = np.empty(len(values))
+    acc = np.nan
+    old_wt = 1.0
+    for i, v in enumerate(values):
+        if acc != acc:
+            # No observation yet: start from the first non-NaN value
+            acc = v
+        else:
+            old_wt *= decay
+            if v == v:
+                if acc != v:
+                    acc = (old_wt * acc + alpha * v) / (old_wt + alpha)
+                old_wt = 1.0
+        out[i] = acc
+    return out
+
+@njit(cache=True, error_model="numpy")
+def compute_anomaly_features(cpu, is_anomaly_iso, window):
+    """
+    Fused single pass over cpu for the Cell 13 anomaly features.
+
+    Keeps the past `window` values in a sorted buffer (insert the newest,
+    drop the oldest) and derives, per row, the past-only rolling median and
+    std (ddof=1, NaN -> 1e-6), the z-score, the z-anomaly flag and the
+    anomaly severity. Matches the shifted pandas rolling ops in training,
+    including NaN for the first row.
+
+    Returns:
+        (roll_median_past, roll_std_past, zscore, is_anomaly_z, anomaly_severity)
+    """
+    n = cpu.shape[0]
+    roll_median_past = np.empty(n)
+    roll_std_past = np.empty(n)
+    zscore = np.empty(n)
+    is_anomaly_z = np.empty(n, dtype=np.int64)
+    severity = np.empty(n)
+
+    buf = np.empty(window)
+    k = 0
+    for i in range(n):
+        # Slide the past-only window to cover rows [i - window, i - 1]
+        if i >= 1:
+            new = cpu[i - 1]
+            if i - 1 - window >= 0:
+                old = cpu[i - 1 - window]
+                if not np.isnan(old):
+                    j = np.searchsorted(buf[:k], old)
+                    buf[j:k - 1] = buf[j + 1:k].copy()
+                    k -= 1
+            if not np.isnan(new):
+                j = np.searchsorted(buf[:k], new)
+                buf[j + 1:k + 1] = buf[j:k].copy()
+                buf[j] = new
+                k += 1
+
+        if k == 0:
+            median = np.nan
+        elif k % 2 == 1:
+            median = buf[k // 2]
+        else:
+            median = 0.5 * (buf[k // 2 - 1] + buf[k // 2])
+
+        if k > 1:
+            mean = 0.0
+            for j in range(k):
+                mean += buf[j]
+            mean /= k
+            sq_dev = 0.0
+            for j in range(k):
+                sq_dev += (buf[j] - mean) ** 2
+            std = np.sqrt(sq_dev / (k - 1))
+        else:
+            std = 1e-6
+
+        z = (cpu[i] - median) / std
+        flag = 1 if abs(z) > 3 else 0
+        roll_median_past[i] = median
+        roll_std_past[i] = std
+        zscore[i] = z
+        is_anomaly_z[i] = flag
+        severity[i] = flag * abs(z) + is_anomaly_iso[i] * 1.0
+
+    return roll_median_past, roll_std_past, zscore, is_anomaly_z, severity
+
+def _check_min_rows(n_rows):
+    """Raise ValueError if there are too few rows for the lag/rolling features."""
+    if n_rows < MIN_ROWS:
+        raise ValueError(
+            f"Insufficient rows for feature engineering: "
+            f"got {n_rows}, need at least {MIN_ROWS}"
+        )
+
+def _past_mean_std(values, window):
+    """Mean and std (ddof=1) of the `window` values before the last one, skipping NaN."""
+    past = values[max(len(values) - 1 - window, 0):len(values) - 1]
+    past = past[~np.isnan(past)]
+    mean = past.mean() if len(past) else np.nan
+    std = past.std(ddof=1) if len(past) > 1 else np.nan
+    return mean, std
+
+@lru_cache(maxsize=8)
+def _feature_plan(only):
+    """
+    Resolve an `only` feature subset (a frozenset, or None for all) once.
+
+    Returns:
+        (mask, sel, names): boolean FEATURE_NAMES mask of features to compute,
+        the column indices to return (None = all) and their names
+    """
+    if only is None:
+        return np.ones(len(FEATURE_NAMES), dtype=bool), None, FEATURE_NAMES
+    unknown = only - FEATURE_INDEX.keys()
+    if unknown:
+        raise ValueError(f"Unknown features requested: {sorted(unknown)}")
+    mask = np.array([name in only for name in FEATURE_NAMES])
+    sel = np.flatnonzero(mask)
+    return mask, sel, tuple(FEATURE_NAMES[i] for i in sel)
+
+def build_features(df, only=None):
     """
     Build features EXACTLY matching training pipeline (from model_training.ipynb).
     
     Args:
         df: DataFrame with columns ['timestamp', 'cpu', 'ram', 'disk']
+        only: Optional iterable of feature names to compute; the rest (and the
+              lag/rolling/IsolationForest work behind them) is skipped.
+              Rows are then dropped only for NaN in these columns.
         
     Returns:
-        DataFrame with engineered features (1 row after dropna)
+        DataFrame with the FEATURE_NAMES columns (or just `only`), in model
+        order (float64, as in training: float32 storage alone moves
+        predictions across tree splits)
         
     Raises:
-        ValueError: If insufficient rows for feature engineering
+        ValueError: If insufficient rows for feature engineering, or `only`
+                    names an unknown feature
     """
-    df = df.copy()
+    feats, keep, names, _ = _build_feature_rows(df, only)
+    return pd.DataFrame(feats, columns=names, index=df.index[keep], copy=False)
 
-    # Ensure timestamp is datetime
-    if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
+def build_feature_matrix(df, only=None):
+    """
+    build_features without the DataFrame: the same rows as a row-major array.
+
+    Args:
+        df: DataFrame with columns ['timestamp', 'cpu', 'ram', 'disk']
+        only: Optional iterable of feature names to compute (see build_features)
+
+    Returns:
+        (feats, timestamps): C-contiguous float64 array of shape
+        (n_rows, n_features), so feats[-1] is a contiguous row, and the
+        datetime64 timestamp of each row
+
+    Raises:
+        ValueError: If insufficient rows for feature engineering, or `only`
+                    names an unknown feature
+    """
+    feats, _, _, timestamps = _build_feature_rows(df, only)
+    return feats, timestamps
+
+def _build_feature_rows(df, only):
+    """Shared body of build_features/build_feature_matrix: (feats, keep mask, names, timestamps)."""
+    mask, sel, names = _feature_plan(None if only is None else frozenset(only))
+
+    # Ensure timestamp is datetime (the input frame itself is never modified)
+    timestamp = df["timestamp"]
+    if not pd.api.types.is_datetime64_any_dtype(timestamp):
+        timestamp = pd.to_datetime(timestamp)
     
     # Validate minimum rows needed (max lag is 12, rolling window is 60)
-    min_rows_required = max(ROLL_WIN, 12) + 1
-    if len(df) < min_rows_required:
-        raise ValueError(
-            f"Insufficient rows for feature engineering: "
-            f"got {len(df)}, need at least {min_rows_required}"
-        )
+    _check_min_rows(len(df))
     
+    cpu = df["cpu"].to_numpy(dtype=np.float64)
+    ram = df["ram"].to_numpy(dtype=np.float64)
+    disk = df["disk"].to_numpy(dtype=np.float64)
+
+    # Every feature is written into a fixed column of one preallocated
+    # matrix, in FEATURE_NAMES order, and wrapped in a DataFrame at the end.
+    out = np.empty((len(df), len(FEATURE_NAMES)), dtype=np.float64)
+    out[:, CPU_IDX] = cpu
+    out[:, RAM_IDX] = ram
+    out[:, DISK_IDX] = disk
+
     # --- Anomaly detection (Cell 13) ---
-    # Rolling statistics (past-only, shifted to avoid leakage)
-    df["cpu_roll_median_past"] = df["cpu"].rolling(window=ROLL_WIN, min_periods=1).median().shift(1)
-    df["cpu_roll_std_past"] = df["cpu"].rolling(window=ROLL_WIN, min_periods=1).std().shift(1).fillna(1e-6)
-    
-    # Z-score (past-only)
-    df["cpu_zscore_past"] = (df["cpu"] - df["cpu_roll_median_past"]) / df["cpu_roll_std_past"]
+    # IsolationForest anomaly (fitted once on the training data, predict only)
+    need_iso = mask[IS_ANOMALY_ISO_IDX] or mask[ANOMALY_SEVERITY_IDX]
+    if need_iso:
+        iso_input = np.ascontiguousarray(df[["cpu", "ram", "disk"]].ffill().to_numpy(), dtype=np.float32)
+        iso_labels = get_iso_forest().predict(iso_input)
+        is_anomaly_iso = (iso_labels == -1).astype(int)
+        out[:, IS_ANOMALY_ISO_IDX] = is_anomaly_iso
+    else:
+        is_anomaly_iso = np.zeros(len(df), dtype=int)
 
-    # Z-score based anomaly
-    df["is_anomaly_z"] = (df["cpu_zscore_past"].abs() > 3).astype(int)
+    # Rolling statistics (past-only), z-score, z-anomaly and severity in one pass
+    if mask[ROLL_MEDIAN_PAST_IDX:ANOMALY_SEVERITY_IDX + 1].any():
+        (
+            out[:, ROLL_MEDIAN_PAST_IDX],
+            out[:, ROLL_STD_PAST_IDX],
+            out[:, ZSCORE_PAST_IDX],
+            out[:, IS_ANOMALY_Z_IDX],
+            out[:, ANOMALY_SEVERITY_IDX],  # MUST be included as feature
+        ) = compute_anomaly_features(cpu, is_anomaly_iso, ROLL_WIN)
 
-    # IsolationForest anomaly (fit on available data)
-    iso = IsolationForest(contamination=0.02, random_state=RANDOM_SEED)
-    iso_labels = iso.fit_predict(df[["cpu", "ram", "disk"]].ffill().values)
-    df["is_anomaly_iso"] = (iso_labels == -1).astype(int)
-    
-    # Anomaly severity (MUST be included as feature)
-    df["anomaly_severity"] = df["is_anomaly_z"] * np.abs(df["cpu_zscore_past"]) + df["is_anomaly_iso"] * 1.0
-    
     # --- Tabular features (Cell 15: build_tabular) ---
     # Time features
-    df["hour"] = df["timestamp"].dt.hour
-    df["minute"] = df["timestamp"].dt.minute
-    df["dayofweek"] = df["timestamp"].dt.dayofweek
-    df["hour_sin"] = np.sin(2 * np.pi * df["hour"] / 24)
-    df["hour_cos"] = np.cos(2 * np.pi * df["hour"] / 24)
+    if mask[HOUR_IDX:HOUR_COS_IDX + 1].any():
+        hour = timestamp.dt.hour.to_numpy()
+        out[:, HOUR_IDX] = hour
+        out[:, MINUTE_IDX] = timestamp.dt.minute.to_numpy()
+        out[:, DAYOFWEEK_IDX] = timestamp.dt.dayofweek.to_numpy()
+        out[:, HOUR_SIN_IDX] = _HOUR_SIN[hour]
+        out[:, HOUR_COS_IDX] = _HOUR_COS[hour]
 
     # Lag features (past-only)
-    lags = [1, 2, 3, 6, 12]
-    for lag in lags:
-        df[f"cpu_lag_{lag}"] = df["cpu"].shift(lag)
-        df[f"ram_lag_{lag}"] = df["ram"].shift(lag)
-        df[f"disk_lag_{lag}"] = df["disk"].shift(lag)
+    idx = CPU_LAG_1_IDX
+    for lag in LAGS:
+        for offset, values in enumerate((cpu, ram, disk)):
+            if mask[idx + offset]:
+                out[:, idx + offset] = _shift(values, lag)
+        idx += 3
 
     # Rolling windows (past-only, shifted)
-    windows = {"short": 3, "med": 12, "long": 60}  # ~15s, 60s, 5min
-    for name, w in windows.items():
-        df[f"cpu_roll_mean_{name}"] = df["cpu"].rolling(window=w, min_periods=1).mean().shift(1)
-        df[f"cpu_roll_std_{name}"] = df["cpu"].rolling(window=w, min_periods=1).std().shift(1).fillna(0)
-        df[f"ram_roll_mean_{name}"] = df["ram"].rolling(window=w, min_periods=1).mean().shift(1)
-        df[f"disk_roll_mean_{name}"] = df["disk"].rolling(window=w, min_periods=1).mean().shift(1)
-    
+    idx = ROLL_SHORT_IDX
+    for w in WINDOWS.values():
+        if mask[idx] or mask[idx + 1]:
+            cpu_mean, cpu_std = _rolling_mean_std(cpu, w)
+            out[:, idx] = _shift(cpu_mean, 1)
+            out[:, idx + 1] = np.nan_to_num(_shift(cpu_std, 1), nan=0.0)
+        if mask[idx + 2]:
+            out[:, idx + 2] = _shift(_rolling_mean_std(ram, w)[0], 1)
+        if mask[idx + 3]:
+            out[:, idx + 3] = _shift(_rolling_mean_std(disk, w)[0], 1)
+        idx += 4
+
     # EWM (past-only, shifted) - adjust=False to match training
-    df["cpu_ewm_30"] = df["cpu"].ewm(span=30, adjust=False).mean().shift(1)
-    
+    if mask[CPU_EWM_30_IDX]:
+        out[:, CPU_EWM_30_IDX] = _shift(_ewm_mean(cpu, 30), 1)
+
     # Cross features
-    df["cpu_x_ram"] = df["cpu"] * df["ram"]
+    out[:, CPU_X_RAM_IDX] = cpu * ram
+
+    # Keep only the requested columns (unrequested ones were never written)
+    if sel is not None:
+        out = out[:, sel]
 
     # Drop rows with NaN (from lag/rolling features)
-    df.dropna(inplace=True)
+    keep = ~np.isnan(out).any(axis=1)
     
     # Final validation: ensure we have at least 1 row
-    if len(df) == 0:
+    if not keep.any():
         raise ValueError("Feature engineering resulted in 0 rows after dropna")
     
-    # Ensure no NaN values remain
-    if df.isnull().any().any():
-        raise ValueError("NaN values detected after feature engineering")
-    
-    return df
+    # Boolean indexing copies, so this is already C-contiguous; make it explicit
+    return np.ascontiguousarray(out[keep]), keep, names, timestamp.to_numpy()[keep]
+
+def build_features_tail(df, only=None):
+    """
+    Build the feature vector for the newest row only.
+
+    Same values as build_features(df, only) on its last row, but only the
+    rows each feature actually depends on are touched, and the result is a
+    plain float64 array (no DataFrame). The EWM looks back at most
+    HISTORY_ROWS rows. build_features stays the full-table version used
+    to match training.
+
+    Args:
+        df: DataFrame with columns ['timestamp', 'cpu', 'ram', 'disk']
+        only: Optional iterable of feature names to compute (see build_features)
+
+    Returns:
+        float64 array of shape (len(FEATURE_NAMES),) in FEATURE_NAMES order,
+        or (len(only),) with just those features in the same order.
+        May contain NaN if the newest row is incomplete (build_features would
+        then fall back to an earlier row).
+
+    Raises:
+        ValueError: If insufficient rows for feature engineering, or `only`
+                    names an unknown feature
+    """
+    mask, sel, _ = _feature_plan(None if only is None else frozenset(only))
+    _check_min_rows(len(df))
+    tail = df.iloc[-HISTORY_ROWS:]
+    cpu = tail["cpu"].to_numpy(dtype=np.float64)
+    ram = tail["ram"].to_numpy(dtype=np.float64)
+    disk = tail["disk"].to_numpy(dtype=np.float64)
+    timestamp = pd.Timestamp(tail["timestamp"].iloc[-1])
+
+    row = np.empty(len(FEATURE_NAMES), dtype=np.float64)
+    row[CPU_IDX] = cpu[-1]
+    row[RAM_IDX] = ram[-1]
+    row[DISK_IDX] = disk[-1]
+
+    # --- Anomaly detection (Cell 13), newest row only ---
+    is_anomaly_iso = 0
+    if mask[IS_ANOMALY_ISO_IDX] or mask[ANOMALY_SEVERITY_IDX]:
+        is_anomaly_iso = int(get_iso_forest().predict(
+            np.array([[cpu[-1], ram[-1], disk[-1]]], dtype=np.float32)
+        )[0] == -1)
+        row[IS_ANOMALY_ISO_IDX] = is_anomaly_iso
+    if mask[ROLL_MEDIAN_PAST_IDX:ANOMALY_SEVERITY_IDX + 1].any():
+        past = cpu[max(len(cpu) - 1 - ROLL_WIN, 0):-1]
+        past = past[~np.isnan(past)]
+        median = np.median(past) if len(past) else np.nan
+        std = past.std(ddof=1) if len(past) > 1 else 1e-6
+        z = (cpu[-1] - median) / std
+        is_anomaly_z = int(abs(z) > 3)
+        row[ROLL_MEDIAN_PAST_IDX] = median
+        row[ROLL_STD_PAST_IDX] = std
+        row[ZSCORE_PAST_IDX] = z
+        row[IS_ANOMALY_Z_IDX] = is_anomaly_z
+        row[ANOMALY_SEVERITY_IDX] = is_anomaly_z * abs(z) + is_anomaly_iso
+
+    # --- Tabular features (Cell 15: build_tabular), newest row only ---
+    row[HOUR_IDX] = timestamp.hour
+    row[MINUTE_IDX] = timestamp.minute
+    row[DAYOFWEEK_IDX] = timestamp.dayofweek
+    row[HOUR_SIN_IDX] = _HOUR_SIN[timestamp.hour]
+    row[HOUR_COS_IDX] = _HOUR_COS[timestamp.hour]
+
+    idx = CPU_LAG_1_IDX
+    for lag in LAGS:
+        row[idx] = cpu[-1 - lag]
+        row[idx + 1] = ram[-1 - lag]
+        row[idx + 2] = disk[-1 - lag]
+        idx += 3
+
+    idx = ROLL_SHORT_IDX
+    for w in WINDOWS.values():
+        if mask[idx] or mask[idx + 1]:
+            cpu_mean, cpu_std = _past_mean_std(cpu, w)
+            row[idx] = cpu_mean
+            row[idx + 1] = 0.0 if np.isnan(cpu_std) else cpu_std
+        if mask[idx + 2]:
+            row[idx + 2] = _past_mean_std(ram, w)[0]
+        if mask[idx + 3]:
+            row[idx + 3] = _past_mean_std(disk, w)[0]
+        idx += 4
+
+    if mask[CPU_EWM_30_IDX]:
+        row[CPU_EWM_30_IDX] = _ewm_mean(cpu[:-1], 30)[-1]
+    row[CPU_X_RAM_IDX] = cpu[-1] * ram[-1]
+    return row if sel is None else row[sel]
@@ -1,38 +1,267 @@
 # ml/inference.py
 
+import io
+import mmap
 import os
+import threading
+import orjson
 import pandas as pd
 import numpy as np
-from ml.load_models import get_xgb_model, get_tab_scaler
-from ml.feature_builder import build_features
+from dataclasses import dataclass
+from ml.load_models import (
+    get_xgb_model,
+    get_tab_scaler,
+    get_scaler_params,
+    get_onnx_session,
+    get_tl_predictor,
+    ONNX_INPUT_NAME,
+)
+from ml.feature_builder import (
+    build_feature_matrix,
+    build_features_tail,
+    FEATURE_NAMES,
+    HISTORY_ROWS,
+    MIN_ROWS,
+)
+from data.live_log import read_live_log_tail, newest_contiguous, records_to_frame
+from ml.batcher import PredictionBatcher
+from ml._hot import scale_row
+from backend.config import (
+    PREDICTOR_BACKEND,
+    CSV_READER,
+    PREDICT_BATCHING,
+    PREDICT_BATCH_MAX,
+    PREDICT_BATCH_WAIT_MS,
+    PREDICT_BATCH_TIMEOUT_SECONDS,
+)
 
-def predict_cpu(csv_path="data/live_buffer.csv"):
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: full reads fall back to pandas' parser
+    pa = None
+
+if pa is not None:
+    # float64 to match the pandas path, so features are identical either way
+    _ARROW_CONVERT_OPTIONS = pacsv.ConvertOptions(column_types={
+        "timestamp": pa.timestamp("ns"),
+        "cpu": pa.float64(),
+        "ram": pa.float64(),
+        "disk": pa.float64(),
+    })
+
+def _predict(X_scaled):
+    """Run the regressor on scaled features with the configured (compiled) backend."""
+    if PREDICTOR_BACKEND == "onnx":
+        sess = get_onnx_session()
+        if sess is not None:
+            X = np.ascontiguousarray(X_scaled, dtype=np.float32)
+            return sess.run(None, {ONNX_INPUT_NAME: X})[0].ravel()
+    elif PREDICTOR_BACKEND == "treelite":
+        predictor = get_tl_predictor()
+        if predictor is not None:
+            import tl2cgen
+            X = np.ascontiguousarray(X_scaled, dtype=np.float32)
+            return predictor.predict(tl2cgen.DMatrix(X)).ravel()
+    # inplace_predict skips the sklearn wrapper and DMatrix construction; the
+    # column layout is validated once in _get_input_plan, not per call
+    return get_xgb_model().inplace_predict(
+        np.ascontiguousarray(X_scaled, dtype=np.float32), validate_features=False
+    )
+
+# Resolved once; relative csv_path arguments are taken from the project root
+_PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+_DEFAULT_CSV = os.path.join(_PROJECT_ROOT, "data", "live_buffer.csv")
+
+# Shared batcher for concurrent predictions (only with PREDICT_BATCHING)
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def _get_batcher():
+    """Create the prediction batcher on first use (thread-safe)."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = PredictionBatcher(
+                    _predict,
+                    max_batch=PREDICT_BATCH_MAX,
+                    max_wait_ms=PREDICT_BATCH_WAIT_MS,
+                    timeout_s=PREDICT_BATCH_TIMEOUT_SECONDS,
+                )
+    return _batcher
+
+# Features read for the confidence score (computed even if the model skips them)
+_CONFIDENCE_FEATURES = ("cpu_roll_std_past", "cpu_roll_mean_long")
+
+# Input layout, resolved once: (only, feat_idx, std_idx, mean_idx, mean,
+# inv_scale). `only` is the feature subset the scaler and confidence score
+# read (None = all of FEATURE_NAMES, the usual case) and is passed to the
+# feature builders so nothing else is computed. feat_idx gives the
+# position of each scaler feature (in the scaler's order) within a built row.
+_input_plan = None
+
+def _get_input_plan():
+    """Validate the scaler's expected features once and cache the build/gather/scale plan."""
+    global _input_plan
+    if _input_plan is None:
+        expected_cols = get_tab_scaler().feature_names_in_ or FEATURE_NAMES
+        missing = set(expected_cols) - set(FEATURE_NAMES)
+        if missing:
+            raise ValueError(
+                f"Missing features expected by scaler: {missing}. "
+                f"Available: {list(FEATURE_NAMES)}"
+            )
+        required = set(expected_cols).union(_CONFIDENCE_FEATURES)
+        only = None if len(required) == len(FEATURE_NAMES) else frozenset(required)
+        built = [name for name in FEATURE_NAMES if name in required]
+        built_index = {name: i for i, name in enumerate(built)}
+
+        feat_idx = np.array([built_index[col] for col in expected_cols], dtype=np.intp)
+        mean, inv_scale = get_scaler_params()
+        _input_plan = (
+            only,
+            feat_idx,
+            built_index["cpu_roll_std_past"],
+            built_index["cpu_roll_mean_long"],
+            mean,
+            inv_scale,
+        )
+    return _input_plan
+
+def _parse_csv_rows(data, names):
+    """Parse header-less metrics CSV bytes, with pyarrow's reader if available."""
+    if not data:
+        return pd.DataFrame({name: [] for name in names})
+    if CSV_READER == "pyarrow" and pa is not None:
+        return pacsv.read_csv(
+            pa.py_buffer(data),
+            read_options=pacsv.ReadOptions(column_names=names),
+            convert_options=_ARROW_CONVERT_OPTIONS,
+        ).to_pandas()
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, parse_dates=["timestamp"])
+
+def _read_csv_tail(csv_path, n_rows, size):
     """
-    Predict future CPU usage (+60s) using XGBoost model.
-    
+    Parse only the last n_rows lines of a metrics CSV (within its first `size` bytes).
+
+    The file is mmapped and scanned backwards for newlines, so the cost is
+    O(n_rows) however long the CSV has grown; only the header and the tail
+    window are paged in. A final line without a trailing newline is parsed
+    too (files written without one lose nothing), but `end` stops before it
+    so a later append that completes it is read from there.
+
+    Returns:
+        (df, end, partial): the parsed rows, the byte offset just past the
+        last complete line, and whether df's last row came from the
+        unterminated line after it
+    """
+    with open(csv_path, "rb") as f:
+        if size == 0:
+            raise ValueError(f"Metrics CSV is empty: {csv_path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = min(size, len(mm))
+            end = mm.rfind(b"\n", 0, size) + 1
+            if end == 0:
+                raise ValueError(f"Metrics CSV has no complete header line: {csv_path}")
+            header_end = mm.find(b"\n", 0, end)
+            names = mm[:header_end].decode().strip().split(",")
+            partial = bool(mm[end:size].strip())
+            stop = size if partial else end
+
+            # Walk back n_rows newlines from the end of the last row
+            cut = size if partial else end - 1
+            for _ in range(n_rows):
+                cut = mm.rfind(b"\n", header_end, cut)
+                if cut <= header_end:
+                    cut = header_end
+                    break
+            start = cut + 1
+
+            if hasattr(mm, "madvise") and start < stop:
+                aligned = start - start % mmap.PAGESIZE
+                mm.madvise(mmap.MADV_SEQUENTIAL, aligned, stop - aligned)
+            data = mm[start:stop]
+    return _parse_csv_rows(data, names), end, partial
+
+# Last parse of each metrics CSV:
+# path -> (st_ino, st_size, st_mtime_ns, consumed bytes, partial, df)
+_csv_cache = {}
+
+def _read_metrics_csv(csv_path):
+    """
+    Read the metrics CSV, reusing the previous parse where possible.
+
+    - unchanged file (same inode, size and mtime): cached frame, no I/O
+    - same inode, grown: parse only the complete lines appended since the
+      last read; an append caught mid-line is held back until it's finished
+    - anything else (rewritten, rotated, truncated): tail read of the last
+      HISTORY_ROWS lines via mmap, never a top-to-bottom parse, including
+      an unterminated last line
+
+    Only the last HISTORY_ROWS rows are kept, which is all build_features
+    needs for the newest row.
+    """
+    st = os.stat(csv_path)
+    cached = _csv_cache.get(csv_path)
+    if cached is not None:
+        ino, size, mtime_ns, consumed, partial, df = cached
+        if st.st_ino == ino and st.st_size == size and st.st_mtime_ns == mtime_ns:
+            return df
+        if st.st_ino == ino and st.st_size > size:
+            with open(csv_path, "rb") as f:
+                f.seek(consumed)
+                tail = f.read(st.st_size - consumed)
+            # Consume complete lines only and remember where they end: an
+            # append caught mid-line is re-read from there once it's finished
+            tail = tail[:tail.rfind(b"\n") + 1]
+            if tail:
+                # The unterminated line the cold read parsed is in `tail` again
+                if partial:
+                    df = df.iloc[:-1]
+                    partial = False
+                new_rows = _parse_csv_rows(tail, list(df.columns))
+                df = pd.concat([df, new_rows], ignore_index=True).iloc[-HISTORY_ROWS:]
+            _csv_cache[csv_path] = (st.st_ino, st.st_size, st.st_mtime_ns, consumed + len(tail), partial, df)
+            return df
+
+    df, end, partial = _read_csv_tail(csv_path, HISTORY_ROWS, st.st_size)
+    _csv_cache[csv_path] = (st.st_ino, st.st_size, st.st_mtime_ns, end, partial, df)
+    return df
+
+@dataclass(slots=True)
+class Prediction:
+    """Result of one CPU prediction."""
+    predicted_cpu: float  # predicted CPU % (+60s)
+    confidence: float     # confidence score 0-1
+
+def _read_default_buffer():
+    """
+    Newest HISTORY_ROWS rows of live metrics: from the binary live log (seek +
+    np.fromfile, no parsing), trimmed to its newest gap-free run, or the CSV
+    (the last fetched window) if the log is missing or that run is too short.
+    """
+    try:
+        records = newest_contiguous(read_live_log_tail(HISTORY_ROWS))
+    except FileNotFoundError:
+        records = None
+    if records is not None and len(records) >= MIN_ROWS:
+        return records_to_frame(records)
+    return _read_metrics_csv(_DEFAULT_CSV)
+
+def model_input(df):
+    """
+    Build the scaled model input for the newest row of df.
+
     Args:
-        csv_path: Path to CSV file with columns ['timestamp', 'cpu', 'ram', 'disk']
-                  Can be relative or absolute path
-        
+        df: DataFrame with columns ['timestamp', 'cpu', 'ram', 'disk']
+
     Returns:
-        dict with keys:
-            - predicted_cpu: float (predicted CPU %)
-            - confidence: float (confidence score 0-1)
+        (X_scaled, latest): the (1, n_features) float32 row fed to the
+        predictor, in the scaler's order, and the float64 feature row it
+        was scaled from, in build order
     """
-    # Load models (lazy-loaded)
-    xgb_model = get_xgb_model()
-    tab_scaler = get_tab_scaler()
-    
-    # Handle relative paths (relative to project root)
-    if not os.path.isabs(csv_path):
-        project_root = os.path.join(os.path.dirname(__file__), "..")
-        csv_path = os.path.join(project_root, csv_path)
-    
-    # Read data
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Metrics file not found: {csv_path}")
-    
-    df = pd.read_csv(csv_path, parse_dates=["timestamp"])
+    only, feat_idx, _, _, scaler_mean, scaler_inv_scale = _get_input_plan()
 
     # Validate required columns
     required_cols = ["timestamp", "cpu", "ram", "disk"]
@@ -40,57 +269,66 @@ def predict_cpu(csv_path="data/live_buffer.csv"):
     if missing_cols:
         raise ValueError(f"Missing required columns: {missing_cols}")
     
-    # Build features
-    feats = build_features(df)
-    
-    # Get latest row (most recent features)
-    latest = feats.iloc[-1:]
+    # Build features for the newest row only; if that row is incomplete,
+    # fall back to the full build, which uses the last complete row instead.
+    # Either way `latest` is a contiguous float64 row (what scale_row was
+    # compiled for), not a strided view into a DataFrame.
+    latest = build_features_tail(df, only=only)
+    if np.isnan(latest).any():
+        latest = build_feature_matrix(df, only=only)[0][-1]
 
-    # Extract feature columns (exclude only timestamp, matching training)
-    # Note: cpu, ram, disk ARE included as features (matching training notebook Cell 17)
-    available_cols = [col for col in latest.columns 
-                      if col not in ["timestamp"]]
-    
-    # Use scaler's expected feature names and order (if available, sklearn 1.0+)
-    # This ensures exact match with training
-    if hasattr(tab_scaler, 'feature_names_in_'):
-        expected_cols = list(tab_scaler.feature_names_in_)
-        # Check for missing features
-        missing = set(expected_cols) - set(available_cols)
-        if missing:
-            raise ValueError(
-                f"Missing features expected by scaler: {missing}. "
-                f"Available: {available_cols}"
-            )
-        # Reorder to match scaler's expected order
-        X = latest[expected_cols]
-    else:
-        # Fallback: use available columns (older sklearn versions)
-        X = latest[available_cols]
+    # Gather into the scaler's training order (cpu, ram, disk included,
+    # matching notebook Cell 17) and scale, fused in one compiled loop that
+    # fills a C-contiguous (1, n_feat) float32 row
+    X_scaled = np.empty((1, feat_idx.shape[0]), dtype=np.float32)
+    scale_row(latest, feat_idx, scaler_mean, scaler_inv_scale, X_scaled[0])
+    return X_scaled, latest
+
+def predict_cpu_result(csv_path=None, df=None) -> Prediction:
+    """
+    Predict future CPU usage (+60s) using XGBoost model.
     
-    # Scale features (scaler expects same columns in same order as training)
-    X_scaled = tab_scaler.transform(X)
+    Args:
+        csv_path: Path to CSV file with columns ['timestamp', 'cpu', 'ram', 'disk']
+                  Can be relative (to the project root) or absolute; defaults
+                  to the binary live log (data/live_buffer.bin), falling back
+                  to data/live_buffer.csv
+        df: Optional in-memory DataFrame with the same columns. When given,
+            csv_path is ignored and nothing is read from disk.
+        
+    Returns:
+        Prediction(predicted_cpu, confidence)
+    """
+    # Confidence feature positions (resolved once; see _get_input_plan)
+    _, _, std_idx, mean_idx, _, _ = _get_input_plan()
+
+    if df is None:
+        if csv_path is None:
+            df = _read_default_buffer()
+        else:
+            # Handle relative paths (relative to project root)
+            csv_path = os.fspath(csv_path)
+            if not os.path.isabs(csv_path):
+                csv_path = os.path.join(_PROJECT_ROOT, csv_path)
+
+            # Read data (raises FileNotFoundError if the file is missing)
+            df = _read_metrics_csv(csv_path)
+
+    X_scaled, latest = model_input(df)
 
     # Predict
     # Note: XGBoost was trained on UNSCALED targets (raw CPU %), so no inverse transform needed.
     # The y_scaler was only used for LSTM training, not XGBoost.
-    y_pred = xgb_model.predict(X_scaled)[0]
+    if PREDICT_BATCHING:
+        y_pred = _get_batcher().submit(X_scaled[0])
+    else:
+        y_pred = _predict(X_scaled)[0]
 
     # Calculate confidence based on coefficient of variation (CV = std/mean)
-    # This normalizes the std by the mean, giving more reasonable confidence values
-    rolling_std = latest["cpu_roll_std_past"].values[0]
-    
-    # Try to get rolling mean (prefer long-term for stability)
-    # Fallback to median if mean not available
-    if "cpu_roll_mean_long" in latest.columns:
-        rolling_mean = latest["cpu_roll_mean_long"].values[0]
-    elif "cpu_roll_mean_med" in latest.columns:
-        rolling_mean = latest["cpu_roll_mean_med"].values[0]
-    elif "cpu_roll_median_past" in latest.columns:
-        rolling_mean = latest["cpu_roll_median_past"].values[0]
-    else:
-        # Fallback: use current CPU value as proxy for mean
-        rolling_mean = latest["cpu"].values[0] if "cpu" in latest.columns else 50.0
+    # This normalizes the std by the mean, giving more reasonable confidence values.
+    # Uses the long-term rolling mean for stability (always built, see _get_input_plan).
+    rolling_std = float(latest[std_idx])
+    rolling_mean = float(latest[mean_idx])
     
     # Avoid division by zero or very small mean
     if rolling_mean < 1.0:
@@ -110,10 +348,35 @@ def predict_cpu(csv_path="data/live_buffer.csv"):
     #   CV=0.3 (30% variability) → confidence = 1/(1+0.3) = 0.77 (good)
     #   CV=0.5 (50% variability) → confidence = 1/(1+0.5) = 0.67 (medium)
     #   CV=1.0 (100% variability) → confidence = 1/(1+1.0) = 0.5 (low)
-    confidence = float(1.0 / (1.0 + normalized_std))
-    confidence = max(0.0, min(1.0, confidence))  # clamp to [0, 1]
+    # std >= 0 and mean >= 1 here, so this is already in (0, 1]; max() only
+    # guards the lower bound against a negative std from bad input
+    confidence = 1.0 / (1.0 + max(normalized_std, 0.0))
     
+    return Prediction(float(y_pred), confidence)
+
+def predict_cpu(csv_path=None, df=None):
+    """
+    Predict future CPU usage (+60s); dict form of predict_cpu_result().
+
+    Returns:
+        dict with keys:
+            - predicted_cpu: float (predicted CPU %)
+            - confidence: float (confidence score 0-1)
+    """
+    result = predict_cpu_result(csv_path=csv_path, df=df)
     return {
-        "predicted_cpu": float(y_pred),
-        "confidence": confidence
+        "predicted_cpu": result.predicted_cpu,
+        "confidence": result.confidence
     }
+
+def predict_cpu_bytes(csv_path=None, df=None) -> bytes:
+    """
+    Predict future CPU usage (+60s) as ready-to-send JSON bytes.
+
+    For RPC/serving paths: orjson serializes the Prediction directly (no
+    intermediate dict), and the bytes it returns are used as-is.
+
+    Returns:
+        JSON bytes: {"predicted_cpu": float, "confidence": float}
+    """
+    return orjson.dumps(predict_cpu_result(csv_path=csv_path, df=df))
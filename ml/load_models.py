@@ -1,35 +1,238 @@
 # ml/load_models.py
 
 import os
-import joblib
-import xgboost as xgb
+import time
+import logging
+import numpy as np
+from collections import namedtuple
+from backend.config import PREDICTOR_BACKEND
+
+RANDOM_SEED = 42
+
+ONNX_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "artifacts", "xgboost_model_final.onnx")
+# Input name of the exported ONNX graph (see ml/export_models.py)
+ONNX_INPUT_NAME = "X"
+TL_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "artifacts", "xgb_model.so")
+TAB_SCALER_JOBLIB_PATH = os.path.join(os.path.dirname(__file__), "..", "artifacts", "tab_scaler_final.joblib")
+TAB_SCALER_NPZ_PATH = os.path.join(os.path.dirname(__file__), "..", "artifacts", "tab_scaler.npz")
+
+# Fitted StandardScaler parameters; all the prediction path needs of the scaler
+Scaler = namedtuple("Scaler", "mean scale feature_names_in_")
 
 # Lazy-loaded model instances (singleton pattern)
 _xgb_model = None
 _tab_scaler = None
+_scaler_params = None
 _y_scaler = None
+_iso_forest = None
+_onnx_session = None
+_onnx_unavailable = False
+_tl_predictor = None
+_tl_unavailable = False
 
 def get_xgb_model():
-    """Load XGBoost model (lazy-loaded, cached after first call)."""
+    """
+    Load XGBoost model as a native Booster (lazy-loaded, cached after first call).
+
+    Pinned to one CPU thread: predictions are single-row, where spinning up
+    the full thread pool costs more than the tree traversal itself.
+    ("device": "cpu" replaces the pre-2.0 "predictor": "cpu_predictor".)
+    """
     global _xgb_model
     if _xgb_model is None:
+        # xgboost pulls in sklearn when present; only load it for this backend
+        import xgboost as xgb
         model_path = os.path.join(os.path.dirname(__file__), "..", "artifacts", "xgboost_model_final.json")
-        _xgb_model = xgb.XGBRegressor()
-        _xgb_model.load_model(model_path)
+        booster = xgb.Booster()
+        booster.load_model(model_path)
+        # Keep only the early-stopped trees, as XGBRegressor.predict would
+        best_iteration = booster.attributes().get("best_iteration")
+        if best_iteration is not None:
+            booster = booster[: int(best_iteration) + 1]
+        booster.set_param({"nthread": 1, "device": "cpu"})
+        _xgb_model = booster
     return _xgb_model
 
+def get_onnx_session():
+    """
+    Load the ONNX-compiled XGBoost model (lazy-loaded, cached after first call).
+
+    onnxruntime is optional: returns None (and warns once) if it isn't
+    installed or the exported model is missing, so callers can fall back to
+    the XGBoost model. Export with `python -m ml.export_models`.
+    """
+    global _onnx_session, _onnx_unavailable
+    if _onnx_session is None and not _onnx_unavailable:
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            logging.warning("onnxruntime not installed, falling back to XGBoost predictor")
+            _onnx_unavailable = True
+            return None
+        if not os.path.exists(ONNX_MODEL_PATH):
+            logging.warning(f"ONNX model not found at {ONNX_MODEL_PATH}, falling back to XGBoost predictor")
+            _onnx_unavailable = True
+            return None
+        # Single-row inputs: one thread avoids pool wake-up/handoff latency
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = 1
+        so.inter_op_num_threads = 1
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        _onnx_session = ort.InferenceSession(
+            ONNX_MODEL_PATH, sess_options=so, providers=["CPUExecutionProvider"]
+        )
+    return _onnx_session
+
+def get_tl_predictor():
+    """
+    Load the Treelite-compiled XGBoost model (lazy-loaded, cached after first call).
+
+    tl2cgen is optional: returns None (and warns once) if it isn't installed
+    or the compiled library is missing, so callers can fall back to the
+    XGBoost model. Build with `python -m ml.export_models treelite`.
+    """
+    global _tl_predictor, _tl_unavailable
+    if _tl_predictor is None and not _tl_unavailable:
+        try:
+            import tl2cgen
+        except ImportError:
+            logging.warning("tl2cgen not installed, falling back to XGBoost predictor")
+            _tl_unavailable = True
+            return None
+        if not os.path.exists(TL_MODEL_PATH):
+            logging.warning(f"Treelite model not found at {TL_MODEL_PATH}, falling back to XGBoost predictor")
+            _tl_unavailable = True
+            return None
+        _tl_predictor = tl2cgen.Predictor(TL_MODEL_PATH, nthread=1)
+    return _tl_predictor
+
+def scaler_from_sklearn(scaler):
+    """Extract a Scaler from a fitted sklearn StandardScaler (honours with_mean/with_std)."""
+    n_features = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return Scaler(
+        mean=np.asarray(mean, dtype=np.float64),
+        scale=np.asarray(scale, dtype=np.float64),
+        feature_names_in_=tuple(getattr(scaler, "feature_names_in_", ())),
+    )
+
 def get_tab_scaler():
-    """Load tabular feature scaler (lazy-loaded, cached after first call)."""
+    """
+    Load tabular feature scaler (lazy-loaded, cached after first call).
+
+    Reads the plain-array NPZ export (no pickle, no sklearn); falls back to
+    the joblib StandardScaler if it hasn't been exported. Export with
+    `python -m ml.export_models scaler`.
+
+    Returns:
+        Scaler(mean, scale, feature_names_in_)
+    """
     global _tab_scaler
     if _tab_scaler is None:
-        scaler_path = os.path.join(os.path.dirname(__file__), "..", "artifacts", "tab_scaler_final.joblib")
-        _tab_scaler = joblib.load(scaler_path)
+        if os.path.exists(TAB_SCALER_NPZ_PATH):
+            with np.load(TAB_SCALER_NPZ_PATH, allow_pickle=False) as npz:
+                _tab_scaler = Scaler(
+                    mean=npz["mean"],
+                    scale=npz["scale"],
+                    feature_names_in_=tuple(str(name) for name in npz["feature_names"]),
+                )
+        else:
+            logging.warning(f"Scaler NPZ not found at {TAB_SCALER_NPZ_PATH}, loading joblib scaler")
+            import joblib
+            _tab_scaler = scaler_from_sklearn(joblib.load(TAB_SCALER_JOBLIB_PATH))
     return _tab_scaler
 
+def get_scaler_params():
+    """
+    StandardScaler parameters as float64 vectors (lazy-loaded, cached after first call).
+
+    Lets callers scale a row with (x - mean) * inv_scale instead of going
+    through sklearn. Both vectors follow the scaler's feature_names_in_ order.
+    Kept float64 like the features: only the scaled row is cast to float32
+    for the model, as XGBRegressor.predict does (see ml.check_equivalence).
+
+    Returns:
+        (mean, inv_scale) float64 arrays of shape (n_features,)
+    """
+    global _scaler_params
+    if _scaler_params is None:
+        scaler = get_tab_scaler()
+        mean = np.ascontiguousarray(scaler.mean, dtype=np.float64)
+        inv_scale = np.ascontiguousarray(1.0 / scaler.scale, dtype=np.float64)
+        _scaler_params = (mean, inv_scale)
+    return _scaler_params
+
 def get_y_scaler():
     """Load target scaler (lazy-loaded, cached after first call)."""
     global _y_scaler
     if _y_scaler is None:
+        import joblib
         scaler_path = os.path.join(os.path.dirname(__file__), "..", "artifacts", "y_scaler_final.joblib")
         _y_scaler = joblib.load(scaler_path)
     return _y_scaler
+
+def get_iso_forest():
+    """
+    Fit the anomaly IsolationForest (lazy-loaded, cached after first call).
+
+    Fitted on the same dataset and settings as the training notebook (Cell 13),
+    so live anomaly labels come from the training-time model instead of a
+    forest refitted on every 60-row window.
+    """
+    global _iso_forest
+    if _iso_forest is None:
+        # sklearn (and its scipy stack) is only imported when the forest is needed
+        import pandas as pd
+        from sklearn.ensemble import IsolationForest
+        data_path = os.path.join(os.path.dirname(__file__), "..", "artifacts", "dataset-800min.csv")
+        df = pd.read_csv(data_path, parse_dates=["timestamp"])
+        df.sort_values("timestamp", inplace=True)
+        X = np.ascontiguousarray(df[["cpu", "ram", "disk"]].ffill().to_numpy(), dtype=np.float32)
+        _iso_forest = IsolationForest(contamination=0.02, random_state=RANDOM_SEED)
+        _iso_forest.fit(X)
+    return _iso_forest
+
+def warmup() -> bool:
+    """
+    Eagerly load every model on the prediction path and run one dummy
+    prediction through each, at process start.
+
+    Keeps artifact loading, the IsolationForest fit, numba's kernel loads and
+    predictor thread setup out of the first request. Never raises; failures are logged and
+    the lazy loaders retry on first use.
+
+    Returns:
+        True if all models loaded, False otherwise
+    """
+    start = time.perf_counter()
+    try:
+        mean, _ = get_scaler_params()
+        dummy = np.zeros((1, mean.shape[0]), dtype=np.float32)
+
+        # XGBoost is always warmed: it is the fallback for the compiled backends
+        get_xgb_model().inplace_predict(dummy, validate_features=False)
+        if PREDICTOR_BACKEND == "onnx":
+            sess = get_onnx_session()
+            if sess is not None:
+                sess.run(None, {ONNX_INPUT_NAME: dummy})
+        elif PREDICTOR_BACKEND == "treelite":
+            predictor = get_tl_predictor()
+            if predictor is not None:
+                import tl2cgen
+                predictor.predict(tl2cgen.DMatrix(dummy))
+
+        get_iso_forest().predict(np.zeros((1, 3), dtype=np.float32))
+
+        # Load the numba kernels (same argument types as the prediction path)
+        from ml.feature_builder import compute_anomaly_features
+        from ml._hot import scale_row
+        compute_anomaly_features(np.zeros(2), np.zeros(2, dtype=np.int64), 1)
+        scale_row(np.zeros(mean.shape[0]), np.arange(mean.shape[0]), mean, mean, dummy[0])
+    except Exception as e:
+        logging.error(f"Model warmup failed: {e}")
+        return False
+
+    logging.info(f"Models warmed up in {time.perf_counter() - start:.2f}s (predictor: {PREDICTOR_BACKEND})")
+    return True